@@ -8,23 +8,134 @@ import sys
 import json
 import signal
 import logging
+import hashlib
+import asyncio
 import time
 import os
+import numpy as np
 import pandas as pd
 import argparse
+import itertools
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from multiprocessing import cpu_count
 import threading
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from src.udpipe.udpipe_utils import UDPipeClient, extract_lemmas_string
+from src.udpipe.udpipe_utils import UDPipeClient, extract_lemmas_string, extract_lemmas_from_conllu
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Rows packed into one UDPipe request; amortizes the round trip and the
+# JSON/TLS overhead over the whole chunk. The character budget matters
+# because the work list is sorted longest-first: without it the first
+# batches would join the 32 longest documents and blow the server's
+# request limit.
+BATCH_SIZE = 32
+MAX_BATCH_CHARS = 100_000
+
+
+def _make_batches(text_data):
+    """Pack (idx, text) pairs into shared requests under a size budget.
+
+    Mirrors UdpipeCaller._make_batches: oversized documents travel alone
+    so they can't take a whole chunk down the per-item fallback with them.
+    """
+    batches = []
+    current = []
+    current_chars = 0
+    for item in text_data:
+        length = len(item[1])
+        if length > MAX_BATCH_CHARS:
+            batches.append([item])
+            continue
+        if current and (len(current) >= BATCH_SIZE
+                        or current_chars + length > MAX_BATCH_CHARS):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(item)
+        current_chars += length
+    if current:
+        batches.append(current)
+    return batches
+
+# Content-addressed lemma cache: identical texts (duplicated prompts and
+# responses are common) resolve to a file read instead of a round trip,
+# and the cache persists across runs. Disabled when the dir is None.
+_lemma_cache_dir = None
+
+def _init_lemma_cache(cache_dir):
+    """Worker initializer: point this scope at the lemma cache directory."""
+    global _lemma_cache_dir
+    _lemma_cache_dir = cache_dir
+
+def _lemma_cache_path(text):
+    if _lemma_cache_dir is None:
+        return None
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(_lemma_cache_dir, key[:2], key)
+
+def _lemma_cache_get(text):
+    path = _lemma_cache_path(text)
+    if path is not None and os.path.exists(path):
+        with open(path, "r") as f:
+            return f.read()
+    return None
+
+def _lemma_cache_put(text, lemmas):
+    path = _lemma_cache_path(text)
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename keeps entries atomic: a reader in another
+        # worker process either sees the whole entry or a miss, never a
+        # torn file, so the one cache can be shared by every worker
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(lemmas)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write lemma cache entry: {e}")
+
+# One client per worker scope — the sessions underneath are thread-local,
+# so sharing the (otherwise stateless) client is safe
+_worker_client = None
+
+def _get_worker_client():
+    global _worker_client
+    if _worker_client is None:
+        _worker_client = UDPipeClient()
+    return _worker_client
+
+
+def _init_worker(cache_dir):
+    """Pool initializer: set up the lemma cache and build this worker's
+    client eagerly, so no task pays the construction on its first row."""
+    _init_lemma_cache(cache_dir)
+    _get_worker_client()
+
 
 # Global function for multiprocessing (needs to be picklable)
 def lemmatize_text_worker(text_data):
@@ -34,17 +145,18 @@ def lemmatize_text_worker(text_data):
         if not text or pd.isna(text) or text.strip() == "":
             return idx, ""
         
-        # Create a new client for each worker
-        client = UDPipeClient()
-        
-        # Get UDPipe response
-        udpipe_output = client.generate_one_response(text)
+        cached = _lemma_cache_get(text)
+        if cached is not None:
+            return idx, cached
         
-        # Parse response
-        sentences = client.parse_response(udpipe_output)
+        # Reuse the per-worker client instead of building one per row
+        client = _get_worker_client()
         
-        # Extract lemmas
-        lemmas = extract_lemmas_string(sentences)
+        # Get UDPipe response and extract lemmas straight from the raw
+        # CoNLL-U — no conllu token objects in the hot path
+        udpipe_output = client.generate_one_response(text)
+        lemmas = extract_lemmas_from_conllu(udpipe_output)
+        _lemma_cache_put(text, lemmas)
         
         return idx, lemmas
         
@@ -59,12 +171,64 @@ def lemmatize_text_worker(text_data):
         return idx, "", error_info  # Return error info as well
 
 
+def lemmatize_batch_worker(batch):
+    """Lemmatize a chunk of (idx, text) pairs with one UDPipe request.
+
+    Falls back to per-item calls when the batched request fails, so one
+    bad document does not poison the whole chunk. Returns
+    (list of (idx, lemmas), list of error_info dicts).
+    """
+    results = {idx: "" for idx, _ in batch}
+    errors = []
+
+    items = [
+        (idx, text) for idx, text in batch
+        if text and not pd.isna(text) and text.strip() != ""
+    ]
+
+    # Serve duplicates from the cache; only unseen texts hit the server
+    uncached = []
+    for idx, text in items:
+        cached = _lemma_cache_get(text)
+        if cached is not None:
+            results[idx] = cached
+        else:
+            uncached.append((idx, text))
+    if not uncached:
+        return list(results.items()), errors
+
+    try:
+        client = _get_worker_client()
+        per_message = client.generate_batch_response([text for _, text in uncached])
+        for (idx, text), sentences in zip(uncached, per_message):
+            lemmas = extract_lemmas_string(sentences)
+            results[idx] = lemmas
+            _lemma_cache_put(text, lemmas)
+    except Exception:
+        # Per-item fallback isolates the offending document
+        for idx, text in uncached:
+            result = lemmatize_text_worker((idx, text))
+            if len(result) == 3:
+                idx, lemmas, error_info = result
+                errors.append(error_info)
+            else:
+                idx, lemmas = result
+            results[idx] = lemmas
+
+    return list(results.items()), errors
+
+
 class LemmatizationProcessor:
     """Process DataFrame text columns for lemmatization using UDPipe."""
     
-    def __init__(self, save_interval=100, n_workers=None, parallel_method="thread"):
+    def __init__(self, save_interval=100, n_workers=None, parallel_method="thread",
+                 cache_dir=None):
         self.udpipe_client = UDPipeClient()
         self.save_interval = save_interval
+        self.cache_dir = cache_dir
+        # Threads share this process's module global; process workers get
+        # theirs through the pool initializer
+        _init_lemma_cache(cache_dir)
         self.processed_count = 0
         self.failed_items = []
         self.current_df = None
@@ -77,6 +241,9 @@ class LemmatizationProcessor:
         else:
             self.lock = None
         
+        # Failures already appended to the JSONL log (avoids rewriting it)
+        self._flushed_failures = 0
+        
         # Setup signal handlers
         signal.signal(signal.SIGTERM, self.handle_sigint)
         signal.signal(signal.SIGINT, self.handle_sigint)
@@ -88,8 +255,9 @@ class LemmatizationProcessor:
             if not text or pd.isna(text) or text.strip() == "":
                 return idx, ""
             
-            # Create a new client for threading to avoid conflicts
-            client = UDPipeClient()
+            # The shared client is safe across threads: its session is
+            # thread-local underneath
+            client = _get_worker_client()
             
             # Get UDPipe response
             udpipe_output = client.generate_one_response(text)
@@ -118,9 +286,17 @@ class LemmatizationProcessor:
             
             return idx, ""  # Return empty string on failure
     
-    def process_dataframe_parallel(self, df, text_column="response", output_column="response_lemm"):
-        """Process DataFrame with parallel processing."""
-        self.current_df = df.copy()
+    def process_dataframe_parallel(self, df, text_column="response", output_column="response_lemm",
+                                   recovery_file=None):
+        """Process DataFrame with parallel processing.
+
+        The frame is enriched in place (only the output column is written);
+        copying it up front doubled peak memory for one appended column.
+        With recovery_file set, each flushed slice of finished rows is also
+        appended to that parquet as a row group, so a crash loses at most
+        one save_interval of work instead of the whole run.
+        """
+        self.current_df = df
         total_rows = len(df)
         
         # Initialize output column if it doesn't exist
@@ -128,11 +304,10 @@ class LemmatizationProcessor:
             self.current_df[output_column] = ""
         
         # Filter rows that need processing (skip rows that already have lemmatized text)
-        mask_empty = (
-            self.current_df[output_column].isna() | 
-            (self.current_df[output_column] == "") | 
-            (self.current_df[output_column] == "None")
-        )
+        # isna plus one hashed isin pass instead of three separate
+        # full-column comparisons
+        col = self.current_df[output_column]
+        mask_empty = col.isna() | col.isin(("", "None"))
         rows_to_process = self.current_df[mask_empty]
         rows_already_processed = total_rows - len(rows_to_process)
         
@@ -147,61 +322,108 @@ class LemmatizationProcessor:
             logger.info("No rows need processing. All rows already have lemmatized text.")
             return self.current_df
         
-        # Prepare data for parallel processing (only rows that need processing)
-        text_data = [(idx, row[text_column]) for idx, row in rows_to_process.iterrows()]
+        # Prepare data for parallel processing (only rows that need
+        # processing) — zip the index and column arrays instead of boxing a
+        # Series per row through iterrows. Blank rows are settled here with
+        # one vectorized pass rather than paying dispatch so a worker can
+        # return "".
+        texts = rows_to_process[text_column].fillna('').astype(str)
+        empty = texts.str.strip() == ''
+        self.current_df.loc[rows_to_process.index[empty], output_column] = ''
+        pending_idx = rows_to_process.index[~empty]
+        text_data = list(zip(pending_idx.values, texts[~empty].values))
+        # Longest texts first (LPT scheduling): a huge document dispatched
+        # last would stall the final drain; sorting also keeps the shared
+        # batches roughly length-homogeneous
+        text_data.sort(key=lambda item: -len(item[1]))
         
         try:
             if self.parallel_method == "thread":
                 executor_class = ThreadPoolExecutor
-                worker_func = self.lemmatize_text_safe
             elif self.parallel_method == "process":
                 executor_class = ProcessPoolExecutor
-                worker_func = lemmatize_text_worker  # Use global function for processes
+            elif self.parallel_method == "async":
+                return self.process_dataframe_async(df, text_column, output_column)
             else:
                 # Sequential processing
                 return self.process_dataframe_sequential(df, text_column, output_column)
             
-            with executor_class(max_workers=self.n_workers) as executor:
-                # Submit all tasks
-                future_to_idx = {
-                    executor.submit(worker_func, data): data[0] 
-                    for data in text_data
+            # Chunked submits: each task lemmatizes up to BATCH_SIZE rows
+            # (bounded by MAX_BATCH_CHARS) with a single UDPipe request
+            # instead of one round trip per row
+            batches = _make_batches(text_data)
+            
+            # Positional result buffer: finished rows cost one dict lookup
+            # and an object-array store instead of any pandas label lookup;
+            # flushes turn the dirty positions into a single .loc write
+            idx_to_pos = {idx: i for i, idx in enumerate(pending_idx.values)}
+            out = np.full(len(pending_idx), "", dtype=object)
+            dirty = []
+            writer_state = {"writer": None}
+
+            def flush_results():
+                if dirty:
+                    flush_idx = pending_idx[dirty]
+                    self.current_df.loc[flush_idx, output_column] = out[dirty]
+                    if recovery_file is not None and pq is not None:
+                        # Append the finished slice as one parquet row group
+                        table = pa.Table.from_pandas(
+                            self.current_df.loc[flush_idx], preserve_index=False
+                        )
+                        if writer_state["writer"] is None:
+                            writer_state["writer"] = pq.ParquetWriter(recovery_file, table.schema)
+                        writer_state["writer"].write_table(table)
+                    dirty.clear()
+
+            with executor_class(max_workers=self.n_workers,
+                                initializer=_init_worker,
+                                initargs=(self.cache_dir,)) as executor:
+                # Sliding-window submission: only ~2x workers of futures are
+                # alive at a time, so huge frames don't preallocate millions
+                # of Future objects before anything completes
+                batch_iter = iter(batches)
+                inflight = {
+                    executor.submit(lemmatize_batch_worker, batch): batch
+                    for batch in itertools.islice(batch_iter, 2 * self.n_workers)
                 }
                 
-                # Process results as they complete
+                # Process results as they complete (results are folded in on
+                # the main thread, so no lock is needed for the counters)
                 with tqdm(total=len(rows_to_process), desc="Lemmatizing") as pbar:
-                    for future in as_completed(future_to_idx):
-                        try:
-                            result = future.result()
-                            
-                            # Handle different return formats
-                            if len(result) == 3:  # Process result with error
-                                idx, lemmatized, error_info = result
-                                if error_info:
-                                    self.failed_items.append(error_info)
-                            else:  # Thread result
-                                idx, lemmatized = result
-                            
-                            self.current_df.at[idx, output_column] = lemmatized
-                            
-                            if self.lock:
-                                with self.lock:
+                    while inflight:
+                        done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            batch = inflight.pop(future)
+                            try:
+                                pairs, errors = future.result()
+                                self.failed_items.extend(errors)
+                                
+                                for idx, lemmatized in pairs:
+                                    pos = idx_to_pos[idx]
+                                    out[pos] = lemmatized
+                                    dirty.append(pos)
                                     self.processed_count += 1
-                                    if self.processed_count % self.save_interval == 0:
-                                        logger.info(f"Progress: {self.processed_count}/{len(rows_to_process)} processed (total: {self.processed_count + rows_already_processed}/{total_rows})")
-                            else:
-                                self.processed_count += 1
-                                if self.processed_count % self.save_interval == 0:
+                                if self.processed_count % self.save_interval < len(pairs):
+                                    # Periodic flush keeps the emergency save current
+                                    flush_results()
                                     logger.info(f"Progress: {self.processed_count}/{len(rows_to_process)} processed (total: {self.processed_count + rows_already_processed}/{total_rows})")
-                            
-                            pbar.update(1)
-                            
-                        except Exception as e:
-                            logger.error(f"Error processing future: {e}")
-                            pbar.update(1)
+                                
+                                pbar.update(len(pairs))
+                                
+                            except Exception as e:
+                                logger.error(f"Error processing batch: {e}")
+                                pbar.update(len(batch))
+                        
+                        # Refill the window with as many batches as completed
+                        for batch in itertools.islice(batch_iter, len(done)):
+                            inflight[executor.submit(lemmatize_batch_worker, batch)] = batch
+            flush_results()
+            if writer_state["writer"] is not None:
+                writer_state["writer"].close()
                             
         except KeyboardInterrupt:
             logger.info("Keyboard interrupt detected. Saving current progress...")
+            flush_results()
             self.handle_sigint(signal.SIGINT, None)
             
         except Exception as e:
@@ -217,9 +439,116 @@ class LemmatizationProcessor:
             
         return self.current_df
     
+    def process_dataframe_async(self, df, text_column="response", output_column="response_lemm",
+                                concurrency=64):
+        """Drive the lemmatization with asyncio + aiohttp.
+
+        The workload is one HTTPS POST per row — pure network wait — so a
+        single thread with a semaphore keeps far more requests in flight
+        than a small thread pool, bounded by the server instead of by
+        local workers.
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp package not available")
+
+        # Enriched in place — see process_dataframe_parallel
+        self.current_df = df
+        total_rows = len(df)
+
+        if output_column not in self.current_df.columns:
+            self.current_df[output_column] = ""
+
+        # isna plus one hashed isin pass instead of three separate
+        # full-column comparisons
+        col = self.current_df[output_column]
+        mask_empty = col.isna() | col.isin(("", "None"))
+        rows_to_process = self.current_df[mask_empty]
+        rows_already_processed = total_rows - len(rows_to_process)
+
+        logger.info(f"Starting async lemmatization of {len(rows_to_process)} rows (skipping {rows_already_processed} already processed)")
+        logger.info(f"Concurrency: {concurrency}")
+
+        if len(rows_to_process) == 0:
+            logger.info("No rows need processing. All rows already have lemmatized text.")
+            return self.current_df
+
+        # Settle blank rows vectorized; only real texts get a request slot
+        texts = rows_to_process[text_column].fillna('').astype(str)
+        empty = texts.str.strip() == ''
+        self.current_df.loc[rows_to_process.index[empty], output_column] = ''
+        text_data = list(zip(rows_to_process.index[~empty].values, texts[~empty].values))
+
+        try:
+            results = asyncio.run(self._lemmatize_all_async(text_data, concurrency))
+            # One vectorized column write instead of a .at call per row
+            if results:
+                indices, lemmas = zip(*results)
+                self.current_df.loc[list(indices), output_column] = list(lemmas)
+                self.processed_count += len(results)
+        except KeyboardInterrupt:
+            logger.info("Keyboard interrupt detected. Saving current progress...")
+            self.handle_sigint(signal.SIGINT, None)
+        finally:
+            self.save_failed_items()
+            logger.info(f"\n=== Processing Summary ===")
+            logger.info(f"Total rows: {total_rows}")
+            logger.info(f"Successfully processed: {self.processed_count}")
+            logger.info(f"Failed items: {len(self.failed_items)}")
+
+        return self.current_df
+
+    async def _lemmatize_all_async(self, text_data, concurrency):
+        """Fan the UDPipe POSTs out over one aiohttp session."""
+        client = UDPipeClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency * 2, ttl_dns_cache=300)
+
+        async def lemmatize_one(session, idx, text):
+            if not text or pd.isna(text) or str(text).strip() == "":
+                return idx, ""
+            request_param = client.data_metadata.copy()
+            request_param["data"] = text
+            async with semaphore:
+                try:
+                    async with session.post(
+                        client.url, data=request_param,
+                        timeout=aiohttp.ClientTimeout(total=30)
+                    ) as response:
+                        if response.status != 200:
+                            raise Exception(f"HTTP Error: {response.status}, {await response.text()}")
+                        # The payload is one huge CoNLL-U string in a small
+                        # dict; orjson decodes it several times faster
+                        if orjson is not None:
+                            payload = await response.json(loads=orjson.loads)
+                        else:
+                            payload = await response.json()
+                    if "result" not in payload:
+                        raise Exception(f"No result in response: {payload}")
+                    return idx, extract_lemmas_from_conllu(payload["result"])
+                except Exception as e:
+                    self.failed_items.append({
+                        "row_index": idx,
+                        "text_preview": text[:100] if text else "None",
+                        "error": str(e),
+                        "timestamp": time.time()
+                    })
+                    return idx, ""
+
+        results = []
+        async with aiohttp.ClientSession(connector=connector) as session:
+            tasks = [lemmatize_one(session, idx, text) for idx, text in text_data]
+            with tqdm(total=len(tasks), desc="Lemmatizing") as pbar:
+                for coroutine in asyncio.as_completed(tasks):
+                    results.append(await coroutine)
+                    pbar.update(1)
+        return results
+
     def process_dataframe_sequential(self, df, text_column="response", output_column="response_lemm"):
-        """Sequential processing (original method)."""
-        self.current_df = df.copy()
+        """Sequential processing (original method).
+
+        The frame is enriched in place (only the output column is written).
+        """
+        self.current_df = df
         total_rows = len(df)
         
         # Initialize output column if it doesn't exist
@@ -227,11 +556,10 @@ class LemmatizationProcessor:
             self.current_df[output_column] = ""
         
         # Filter rows that need processing (skip rows that already have lemmatized text)
-        mask_empty = (
-            self.current_df[output_column].isna() | 
-            (self.current_df[output_column] == "") | 
-            (self.current_df[output_column] == "None")
-        )
+        # isna plus one hashed isin pass instead of three separate
+        # full-column comparisons
+        col = self.current_df[output_column]
+        mask_empty = col.isna() | col.isin(("", "None"))
         rows_to_process = self.current_df[mask_empty]
         rows_already_processed = total_rows - len(rows_to_process)
         
@@ -246,8 +574,8 @@ class LemmatizationProcessor:
         
         try:
             # Process with progress bar (only rows that need processing)
-            for idx, row in tqdm(rows_to_process.iterrows(), total=len(rows_to_process), desc="Lemmatizing"):
-                text = row[text_column]
+            row_iter = zip(rows_to_process.index.values, rows_to_process[text_column].values)
+            for idx, text in tqdm(row_iter, total=len(rows_to_process), desc="Lemmatizing"):
                 
                 try:
                     idx, lemmatized = self.lemmatize_text_safe((idx, text))
@@ -282,15 +610,23 @@ class LemmatizationProcessor:
         return self.current_df
     
     def save_failed_items(self, output_path=None):
-        """Save failed items to JSON file."""
-        if self.failed_items:
+        """Append failures recorded since the last flush to a JSONL log.
+
+        Appending one line per failure keeps every flush O(new failures)
+        instead of re-serializing the whole list, and the log streams into
+        downstream tooling.
+        """
+        new_items = self.failed_items[self._flushed_failures:]
+        if new_items:
             try:
                 if output_path is None:
-                    output_path = "lemmatization_failed_items.json"
+                    output_path = "lemmatization_failed_items.jsonl"
                 
-                with open(output_path, 'w') as f:
-                    json.dump(self.failed_items, f, indent=2)
-                logger.info(f"Failed items saved to: {output_path}")
+                with open(output_path, 'a', buffering=1<<16) as f:
+                    for item in new_items:
+                        f.write(json.dumps(item) + '\n')
+                self._flushed_failures = len(self.failed_items)
+                logger.info(f"Failed items appended to: {output_path}")
                 
             except Exception as e:
                 logger.error(f"Failed to save failed items: {e}")
@@ -306,7 +642,7 @@ class LemmatizationProcessor:
                 logger.info(f"Emergency save completed: {emergency_path}")
                 logger.info(f"Processed {self.processed_count} items before interruption.")
                 
-            self.save_failed_items("lemmatization_failed_items_emergency.json")
+            self.save_failed_items("lemmatization_failed_items_emergency.jsonl")
             
         except Exception as e:
             logger.error(f"Error during emergency save: {e}")
@@ -315,6 +651,20 @@ class LemmatizationProcessor:
         sys.exit(0)
 
 
+def merge_shards(pattern, output_file):
+    """Merge per-shard outputs (see --shard/--num_shards) into one parquet."""
+    import glob
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise ValueError(f"No shard files match {pattern}")
+    if pq is not None:
+        pq.write_table(pa.concat_tables(pq.read_table(path) for path in paths), output_file)
+    else:
+        frames = [pd.read_parquet(path) for path in paths]
+        pd.concat(frames, ignore_index=True).to_parquet(output_file, index=False)
+    logger.info(f"Merged {len(paths)} shards into {output_file}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Lemmatize text data using UDPipe")
     
@@ -331,8 +681,14 @@ def main():
     parser.add_argument("--workers", type=int, default=None,
                         help="Number of parallel workers (default: min(8, CPU count))")
     parser.add_argument("--parallel", type=str, default="thread",
-                        choices=["thread", "process", "sequential"],
+                        choices=["thread", "process", "sequential", "async"],
                         help="Parallel processing method")
+    parser.add_argument("--cache_dir", type=str, default=None,
+                        help="Directory for the persistent lemma cache (disabled when unset)")
+    parser.add_argument("--shard", type=int, default=0,
+                        help="Shard index (0-based) when splitting the corpus across jobs")
+    parser.add_argument("--num_shards", type=int, default=None,
+                        help="Total number of shards; each job writes <output>.part<shard>")
     
     args = parser.parse_args()
     
@@ -346,11 +702,20 @@ def main():
         if args.text_column not in df.columns:
             raise ValueError(f"Text column '{args.text_column}' not found in data")
         
+        # Shard selection for multi-process / multi-host runs: each job
+        # takes an interleaved slice and writes its own part file, merged
+        # afterwards with merge_shards
+        if args.num_shards:
+            df = df.iloc[args.shard::args.num_shards]
+            args.output_file = f"{args.output_file}.part{args.shard}"
+            logger.info(f"Processing shard {args.shard}/{args.num_shards}: {len(df)} rows -> {args.output_file}")
+        
         # Process lemmatization
         processor = LemmatizationProcessor(
             save_interval=args.save_interval,
             n_workers=args.workers,
-            parallel_method=args.parallel
+            parallel_method=args.parallel,
+            cache_dir=args.cache_dir
         )
         
         if args.parallel == "sequential":
@@ -363,12 +728,17 @@ def main():
             result_df = processor.process_dataframe_parallel(
                 df, 
                 text_column=args.text_column,
-                output_column=args.output_column
+                output_column=args.output_column,
+                recovery_file=args.output_file + ".partial"
             )
         
         # Save results
         logger.info(f"Saving results to: {args.output_file}")
         result_df.to_parquet(args.output_file, index=False)
+        # The recovery shards are superseded by the complete file
+        partial_path = args.output_file + ".partial"
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
         logger.info("Lemmatization completed successfully!")
         
     except Exception as e:
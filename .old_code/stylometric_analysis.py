@@ -12,18 +12,88 @@ for parliamentary discourse analysis, including:
 Based on the methodology described in parliamentary discourse analysis research.
 """
 
+import os
 import pandas as pd
 import numpy as np
 import spacy
+from spacy.attrs import POS, IS_PUNCT, IS_SPACE, LENGTH
+from spacy.symbols import NOUN, VERB, ADJ, ADV
 import re
-from collections import Counter
 from typing import Dict
 import logging
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Codepoint tables for the JIT syllable counter (vowels mirror the Python
+# path below, including nasal vowels)
+_VOWEL_CODES = np.array([ord(c) for c in "aeiouáéíóúàèìòùâêîôûãõç"], dtype=np.uint32)
+_EXTRA_LETTER_CODES = np.array([ord(c) for c in "áéíóúàèìòùâêîôûãõç"], dtype=np.uint32)
+_DIPH_FIRST = np.array([ord(d[0]) for d in ("ai", "au", "ei", "eu", "oi", "ou", "ui")], dtype=np.uint32)
+_DIPH_SECOND = np.array([ord(d[1]) for d in ("ai", "au", "ei", "eu", "oi", "ou", "ui")], dtype=np.uint32)
+
+# Pure-Python fallback tables: precompiled letter filter, vowel codepoints,
+# and diphthong pairs packed as (first<<16)|second for single-pass detection
+_NON_PT_LETTER = re.compile(r'[^a-záéíóúàèìòùâêîôûãõç]')
+_VOWEL_ORDS = frozenset(map(ord, "aeiouáéíóúàèìòùâêîôûãõç"))
+_DIPH_PAIRS = frozenset((ord(d[0]) << 16) | ord(d[1]) for d in ("ai", "au", "ei", "eu", "oi", "ou", "ui"))
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _syllables_nb(codes, vowels, extra_letters, diph_first, diph_second):
+        """Native single pass over lowercased codepoints: filter to letters,
+        count vowel-group starts, subtract diphthong pairs."""
+        letters = np.empty(codes.size, dtype=np.uint32)
+        n = 0
+        for i in range(codes.size):
+            c = codes[i]
+            keep = 97 <= c <= 122
+            if not keep:
+                for j in range(extra_letters.size):
+                    if c == extra_letters[j]:
+                        keep = True
+                        break
+            if keep:
+                letters[n] = c
+                n += 1
+        if n == 0:
+            return 1
+
+        count = 0
+        prev_vowel = False
+        for i in range(n):
+            c = letters[i]
+            is_vowel = False
+            for j in range(vowels.size):
+                if c == vowels[j]:
+                    is_vowel = True
+                    break
+            if is_vowel and not prev_vowel:
+                count += 1
+            prev_vowel = is_vowel
+
+        for i in range(n - 1):
+            for j in range(diph_first.size):
+                if letters[i] == diph_first[j] and letters[i + 1] == diph_second[j]:
+                    count -= 1
+                    break
+
+        return count if count > 1 else 1
+
+    # Prewarm so the first real document doesn't pay the compile
+    _syllables_nb(
+        np.frombuffer("aquecimento".encode("utf-32-le"), dtype=np.uint32),
+        _VOWEL_CODES, _EXTRA_LETTER_CODES, _DIPH_FIRST, _DIPH_SECOND,
+    )
+else:
+    _syllables_nb = None
+
 
 class StylometricAnalyzer:
     """
@@ -37,17 +107,23 @@ class StylometricAnalyzer:
         Args:
             model_name: spaCy Portuguese model name
         """
+        # The analyzer only needs POS, sentence boundaries and NER — the
+        # lemmatizer would run per token and never be read
         try:
-            self.nlp = spacy.load(model_name)
+            self.nlp = spacy.load(model_name, exclude=["lemmatizer"])
             logger.info(f"Loaded spaCy model: {model_name}")
         except IOError:
             logger.warning(f"Model {model_name} not found. Trying pt_core_news_sm...")
             try:
-                self.nlp = spacy.load("pt_core_news_sm")
+                self.nlp = spacy.load("pt_core_news_sm", exclude=["lemmatizer"])
                 logger.info("Loaded spaCy model: pt_core_news_sm")
             except IOError:
                 logger.error("No Portuguese spaCy model found. Please install with: python -m spacy download pt_core_news_lg")
                 raise
+        
+        # Word frequencies are Zipfian — a handful of function words make up
+        # most tokens — so syllable counts are memoized per lowercased word
+        self._syll_cache = {}
     
     def calculate_flesch_reading_ease_pt(self, text: str) -> float:
         """
@@ -65,12 +141,11 @@ class StylometricAnalyzer:
         if not text or not text.strip():
             return 0.0
         
+        return self._flesch_from_doc(self.nlp(text))
+    
+    def _flesch_from_doc(self, doc) -> float:
+        """Flesch Reading Ease from a pre-parsed Doc."""
         try:
-            # Use textstat library which has Portuguese support
-            # Note: textstat might not have perfect Portuguese syllable counting,
-            # so we'll implement a basic version for Portuguese
-            doc = self.nlp(text)
-            
             # Count sentences
             sentences = list(doc.sents)
             total_sentences = len(sentences)
@@ -116,29 +191,44 @@ class StylometricAnalyzer:
         if not word:
             return 0
         
-        # Portuguese vowels (including nasal vowels)
-        vowels = "aeiouáéíóúàèìòùâêîôûãõç"
+        count = self._syll_cache.get(word)
+        if count is not None:
+            return count
         
-        # Remove punctuation
-        word = re.sub(r'[^a-záéíóúàèìòùâêîôûãõç]', '', word)
+        count = self._count_syllables_uncached(word)
+        self._syll_cache[word] = count
+        return count
+    
+    @staticmethod
+    def _count_syllables_uncached(word: str) -> int:
+        """Syllable count for an unseen lowercased word."""
+        if _syllables_nb is not None:
+            codes = np.frombuffer(word.encode("utf-32-le"), dtype=np.uint32)
+            return int(_syllables_nb(
+                codes, _VOWEL_CODES, _EXTRA_LETTER_CODES, _DIPH_FIRST, _DIPH_SECOND
+            ))
+        
+        # Remove punctuation (precompiled pattern)
+        word = _NON_PT_LETTER.sub('', word)
         
         if not word:
             return 1
         
+        # Single pass: count vowel-group starts and subtract diphthong
+        # pairs inline instead of seven str.count rescans
         syllable_count = 0
         previous_was_vowel = False
+        prev_ord = 0
         
         for char in word:
-            is_vowel = char in vowels
+            cur_ord = ord(char)
+            is_vowel = cur_ord in _VOWEL_ORDS
             if is_vowel and not previous_was_vowel:
                 syllable_count += 1
+            if ((prev_ord << 16) | cur_ord) in _DIPH_PAIRS:
+                syllable_count -= 1
             previous_was_vowel = is_vowel
-        
-        # Portuguese specific adjustments
-        # Handle common diphthongs that should count as one syllable
-        diphthongs = ['ai', 'au', 'ei', 'eu', 'oi', 'ou', 'ui']
-        for diphthong in diphthongs:
-            syllable_count -= word.count(diphthong)
+            prev_ord = cur_ord
         
         # Ensure at least one syllable
         return max(1, syllable_count)
@@ -156,30 +246,28 @@ class StylometricAnalyzer:
         if not text or not text.strip():
             return {"noun_freq": 0.0, "verb_freq": 0.0, "adj_freq": 0.0, "adv_freq": 0.0}
         
+        return self._pos_frequencies_from_doc(self.nlp(text))
+    
+    def _pos_frequencies_from_doc(self, doc) -> Dict[str, float]:
+        """POS tag frequencies from a pre-parsed Doc."""
         try:
-            doc = self.nlp(text)
-            
-            # Filter out punctuation and spaces
-            tokens = [token for token in doc if not token.is_punct and not token.is_space]
-            total_tokens = len(tokens)
+            # One C-level attribute export, then pure NumPy mask math —
+            # no per-token Python attribute lookups
+            arr = doc.to_array([POS, IS_PUNCT, IS_SPACE])
+            word_mask = (arr[:, 1] == 0) & (arr[:, 2] == 0)
+            total_tokens = int(word_mask.sum())
             
             if total_tokens == 0:
                 return {"noun_freq": 0.0, "verb_freq": 0.0, "adj_freq": 0.0, "adv_freq": 0.0}
             
-            # Count POS tags
-            pos_counts = Counter(token.pos_ for token in tokens)
+            pos = arr[word_mask, 0]
             
             # Calculate frequencies as percentages
-            noun_freq = (pos_counts.get('NOUN', 0) / total_tokens) * 100
-            verb_freq = (pos_counts.get('VERB', 0) / total_tokens) * 100
-            adj_freq = (pos_counts.get('ADJ', 0) / total_tokens) * 100
-            adv_freq = (pos_counts.get('ADV', 0) / total_tokens) * 100
-            
             return {
-                "noun_freq": round(noun_freq, 2),
-                "verb_freq": round(verb_freq, 2),
-                "adj_freq": round(adj_freq, 2),
-                "adv_freq": round(adv_freq, 2)
+                "noun_freq": round(float((pos == NOUN).sum()) / total_tokens * 100, 2),
+                "verb_freq": round(float((pos == VERB).sum()) / total_tokens * 100, 2),
+                "adj_freq": round(float((pos == ADJ).sum()) / total_tokens * 100, 2),
+                "adv_freq": round(float((pos == ADV).sum()) / total_tokens * 100, 2)
             }
             
         except Exception as e:
@@ -199,9 +287,11 @@ class StylometricAnalyzer:
         if not text or not text.strip():
             return {"per_count": 0, "org_count": 0, "loc_count": 0}
         
+        return self._entities_from_doc(self.nlp(text))
+    
+    def _entities_from_doc(self, doc) -> Dict[str, int]:
+        """Named entity counts from a pre-parsed Doc."""
         try:
-            doc = self.nlp(text)
-            
             # Count entities by type
             entity_counts = {"per_count": 0, "org_count": 0, "loc_count": 0}
             
@@ -237,30 +327,30 @@ class StylometricAnalyzer:
                 "punctuation_ratio": 0.0
             }
         
+        return self._additional_metrics_from_doc(self.nlp(text))
+    
+    def _additional_metrics_from_doc(self, doc) -> Dict[str, float]:
+        """Additional stylometric metrics from a pre-parsed Doc."""
         try:
-            doc = self.nlp(text)
+            # One C-level attribute export shared by every metric below
+            arr = doc.to_array([IS_PUNCT, IS_SPACE, LENGTH])
+            word_mask = (arr[:, 0] == 0) & (arr[:, 1] == 0)
+            lengths = arr[word_mask, 2]
             
             # Calculate average word length
-            words = [token.text for token in doc if not token.is_punct and not token.is_space]
-            avg_word_length = np.mean([len(word) for word in words]) if words else 0.0
+            avg_word_length = float(lengths.mean()) if lengths.size else 0.0
             
             # Calculate ratio of long words (>6 characters)
-            long_words = [word for word in words if len(word) > 6]
-            long_words_ratio = (len(long_words) / len(words)) * 100 if words else 0.0
-            
-            # Calculate sentence length variance
-            sentences = list(doc.sents)
-            sentence_lengths = []
-            for sent in sentences:
-                sent_words = [token for token in sent if not token.is_punct and not token.is_space]
-                sentence_lengths.append(len(sent_words))
+            long_words_ratio = float((lengths > 6).mean()) * 100 if lengths.size else 0.0
             
+            # Calculate sentence length variance (word counts per sentence
+            # come from slicing the precomputed mask)
+            sentence_lengths = [int(word_mask[sent.start:sent.end].sum()) for sent in doc.sents]
             sentence_length_variance = np.var(sentence_lengths) if sentence_lengths else 0.0
             
             # Calculate punctuation ratio
-            total_tokens = len(list(doc))
-            punct_tokens = len([token for token in doc if token.is_punct])
-            punctuation_ratio = (punct_tokens / total_tokens) * 100 if total_tokens > 0 else 0.0
+            total_tokens = arr.shape[0]
+            punctuation_ratio = float(arr[:, 0].sum()) / total_tokens * 100 if total_tokens > 0 else 0.0
             
             return {
                 "avg_word_length": round(avg_word_length, 2),
@@ -293,24 +383,31 @@ class StylometricAnalyzer:
             return self._get_empty_metrics()
         
         try:
-            # Calculate all metrics
-            flesch_score = self.calculate_flesch_reading_ease_pt(text)
-            pos_freqs = self.calculate_pos_frequencies(text)
-            entities = self.extract_named_entities(text)
-            additional = self.calculate_additional_metrics(text)
+            # Parse once and derive every metric block from the same Doc
+            return self.analyze_doc(self.nlp(text))
             
-            # Combine all metrics
-            results = {
-                "flesch_reading_ease": flesch_score,
-                **pos_freqs,
-                **entities,
-                **additional
+        except Exception as e:
+            logger.error(f"Error in comprehensive text analysis: {e}")
+            return self._get_empty_metrics()
+    
+    def analyze_doc(self, doc) -> Dict[str, float]:
+        """
+        Perform comprehensive stylometric analysis on a pre-parsed Doc.
+        
+        Parsing dominates the cost of analyze_text, and the four metric
+        blocks used to re-run self.nlp over the same text — sharing one
+        Doc does the linguistic work exactly once.
+        """
+        try:
+            return {
+                "flesch_reading_ease": self._flesch_from_doc(doc),
+                **self._pos_frequencies_from_doc(doc),
+                **self._entities_from_doc(doc),
+                **self._additional_metrics_from_doc(doc)
             }
             
-            return results
-            
         except Exception as e:
-            logger.error(f"Error in comprehensive text analysis: {e}")
+            logger.error(f"Error in comprehensive doc analysis: {e}")
             return self._get_empty_metrics()
     
     def _get_empty_metrics(self) -> Dict[str, float]:
@@ -333,7 +430,8 @@ class StylometricAnalyzer:
 
 def process_dataframe(df: pd.DataFrame, 
                      text_column: str = 'response',
-                     batch_size: int = 100) -> pd.DataFrame:
+                     batch_size: int = 100,
+                     n_process: int = None) -> pd.DataFrame:
     """
     Process a DataFrame and add stylometric analysis columns.
     
@@ -341,35 +439,54 @@ def process_dataframe(df: pd.DataFrame,
         df: Input DataFrame
         text_column: Name of the column containing text to analyze
         batch_size: Number of rows to process at once (for memory management)
+        n_process: Worker processes for the spaCy parse (default: all cores
+            but one). spaCy forks its own workers inside nlp.pipe, so the
+            GIL-bound parse fans out without a separate executor.
         
     Returns:
         DataFrame with added stylometric columns
     """
+    if n_process is None:
+        n_process = max(1, os.cpu_count() - 1)
+
     logger.info(f"Starting stylometric analysis on {len(df)} rows...")
     
     # Initialize analyzer
     analyzer = StylometricAnalyzer()
     
-    # Initialize result lists
-    results = []
+    # Duplicated texts (boilerplate, templated answers) are analyzed once:
+    # factorize the column and run the pipeline over the unique strings,
+    # then scatter results back through the codes
+    codes, uniques = pd.factorize(df[text_column].fillna("").astype(str))
+    unique_texts = uniques.tolist()
+    n = len(unique_texts)
+    logger.info(f"Analyzing {n} unique texts ({len(df)} rows)")
     
-    # Process in batches
-    for i in range(0, len(df), batch_size):
-        batch_end = min(i + batch_size, len(df))
-        batch_df = df.iloc[i:batch_end].copy()
-        
-        logger.info(f"Processing batch {i//batch_size + 1}/{(len(df)-1)//batch_size + 1} (rows {i+1}-{batch_end})")
-        
-        batch_results = []
-        for idx, row in batch_df.iterrows():
-            text = str(row[text_column]) if pd.notna(row[text_column]) else ""
-            analysis = analyzer.analyze_text(text)
-            batch_results.append(analysis)
-        
-        results.extend(batch_results)
+    # Preallocate one typed array per metric and fill positionally — no
+    # per-row dicts to accumulate and no dtype inference at the end
+    int_cols = ("per_count", "org_count", "loc_count")
+    cols = {
+        key: np.zeros(n, dtype=np.int32 if key in int_cols else np.float32)
+        for key in analyzer._get_empty_metrics()
+    }
+    
+    # One nlp.pipe call over the entire unique stream — one spaCy pass
+    # shared by all metric blocks, and the worker processes fork exactly
+    # once for the run. Calling pipe per batch re-forked (and re-serialized
+    # the model to) n_process children every hundred texts, which costs
+    # more than the parsing it parallelizes.
+    docs = analyzer.nlp.pipe(
+        unique_texts, batch_size=batch_size, n_process=n_process
+    )
+    for j, (text, doc) in enumerate(zip(unique_texts, docs)):
+        if j % batch_size == 0:
+            logger.info(f"Processing batch {j//batch_size + 1}/{(n-1)//batch_size + 1}")
+        metrics = analyzer.analyze_doc(doc) if text.strip() else analyzer._get_empty_metrics()
+        for key, value in metrics.items():
+            cols[key][j] = value
     
-    # Convert results to DataFrame
-    results_df = pd.DataFrame(results)
+    # Assemble the DataFrame by scattering the unique results back to rows
+    results_df = pd.DataFrame({key: arr[codes] for key, arr in cols.items()})
     
     # Add results to original DataFrame
     for col in results_df.columns:
@@ -38,8 +38,30 @@ class GeminiClient(GenericClient):
         
         return response.text
 
+    async def create_batch_async(self, config, messages_batch):
+        """
+        Batched asynchronous content generation with rate limiting.
+
+        The batch is ntimes copies of the same prompt, so a single request
+        asking for len(messages_batch) candidates replaces that many
+        separate calls against the RPM ceiling.
+        """
+        prompt = self._format_messages(messages_batch[0])
+
+        async with self.limiter:
+            response = await self.client.aio.models.generate_content(
+                **config,
+                contents=prompt,
+                config={"candidate_count": len(messages_batch)},
+            )
+
+        return [candidate.content.parts[0].text for candidate in response.candidates]
+
     def _format_messages(self, messages):
         """Formats messages for Gemini."""
+        # Records now store the message as its plain text
+        if isinstance(messages, str):
+            return messages
         formatted_prompt = ""
         for c in messages.content:
             formatted_prompt += c.text + "\n"
@@ -11,5 +11,10 @@ class GenericClient():
     async def create_async(self,config,messages):
         pass
 
+    async def create_batch_async(self,config,messages_batch):
+        # Default: no batch endpoint, fall back to one call per message
+        coroutines = [self.create_async(config, messages) for messages in messages_batch]
+        return await asyncio.gather(*coroutines)
+
     async def send_batch_messages(self,config,messages):
         pass
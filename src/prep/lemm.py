@@ -19,10 +19,12 @@ def generate_one_response(message):
     # Check if the response is valid
     if response.status_code != 200:
         raise Exception(f"Error: {response.status_code}, {response.text}")
-    # Check if the response is valid
-    if "result" not in response.json():
+    # Decode the JSON payload once — the CoNLL-U result can be large and
+    # response.json() re-parses the body on every call
+    payload = response.json()
+    if "result" not in payload:
         raise Exception(f"Error: {response.status_code}, {response.text}")
-    udpipe_output = parse(response.json()["result"])
+    udpipe_output = parse(payload["result"])
     return udpipe_output
 
 # %%
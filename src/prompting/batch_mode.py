@@ -0,0 +1,124 @@
+"""
+Offline batch mode for call_llm using OpenAI's async Batch API.
+
+Large static records do not need real-time responses — they need cheap
+throughput. The Batch API runs the same chat completions at half the
+synchronous price within a 24h window, so instead of being bound by the
+RPM ceiling we upload one JSONL of pending requests, poll the job, and
+merge the results back into the record.
+"""
+import json
+import asyncio
+import logging
+import tempfile
+
+logger = logging.getLogger("call_llm")
+
+POLL_INTERVAL_SECONDS = 30
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def build_request_lines(record, ntimes, convert_message, model):
+    """Serialize one model's pending (messageId, config, message) rows into
+    Batch API lines.
+
+    Records hold rows rendered from every config template, so each model's
+    rows must be serialized for (and submitted through) its own adapter.
+    Rows that already satisfy response_count >= ntimes are skipped; rows
+    that are partially done only request the missing samples.
+    """
+    counts = record.build_response_count_map()
+    lines = []
+    for row in record.message_iter():
+        if row["model"] != model:
+            continue
+        messageId = row["messageId"]
+        config = {key: row[key] for key in record.config_keys}
+        remaining = ntimes - counts.get(messageId, 0)
+        for sample in range(remaining):
+            lines.append({
+                "custom_id": f"{messageId}:{sample}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {**config, "messages": convert_message(row["message"])},
+            })
+    return lines
+
+
+async def run_batch(record, ntimes, client_factory, supported_models):
+    """Submit pending rows through the Batch API, one job per supported model.
+
+    Mirrors the synchronous path's model gate: rows whose model is not in
+    supported_models are skipped rather than uploaded to whichever adapter
+    happens to come first.
+
+    Args:
+        record: RenderedPromptRecord with pending messages
+        ntimes: Desired number of responses per messageId
+        client_factory: ClientFactory used to resolve each model's adapter
+        supported_models: Models whose adapters speak the OpenAI Batch API
+
+    Returns:
+        The record, with responses added and saved to the mirror file.
+    """
+    models = sorted({str(row["model"]) for row in record.message_iter()})
+    submitted = False
+    for model in models:
+        if model not in supported_models:
+            logger.info(f"Batch mode: skipping model {model} as model is not impl")
+            continue
+        client = client_factory.get_client(model)
+        lines = build_request_lines(record, ntimes, client._convert_message_format, model)
+        if not lines:
+            logger.info(f"Batch mode: nothing pending for model {model}")
+            continue
+        await _run_model_batch(record, client, lines, model)
+        submitted = True
+
+    if submitted:
+        record.save_to_mirror_file()
+    else:
+        logger.info("Batch mode: nothing pending, all rows already satisfied")
+    return record
+
+
+async def _run_model_batch(record, client, lines, model):
+    """Upload one model's JSONL, poll the job, and merge the choices back."""
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+        input_path = f.name
+    logger.info(f"Batch mode: submitting {len(lines)} requests for {model} from {input_path}")
+
+    openai_client = client.client
+    batch_file = await openai_client.files.create(file=open(input_path, "rb"), purpose="batch")
+    batch = await openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info(f"Batch mode: created batch {batch.id}, polling every {POLL_INTERVAL_SECONDS}s...")
+
+    while batch.status not in TERMINAL_STATUSES:
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        batch = await openai_client.batches.retrieve(batch.id)
+        logger.info(f"Batch mode: batch {batch.id} status is {batch.status}")
+
+    if batch.status != "completed":
+        raise Exception(f"Batch {batch.id} finished with status {batch.status}")
+
+    # custom_ids round-trip as strings, so map them back to the record's UUIDs
+    id_map = {str(row["messageId"]): row["messageId"] for row in record.message_iter()}
+
+    output = await openai_client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        messageId = id_map.get(result["custom_id"].split(":")[0])
+        body = (result.get("response") or {}).get("body") or {}
+        choices = body.get("choices", [])
+        if messageId is not None and choices:
+            record.add_response(messageId, choices[0]["message"]["content"])
+        else:
+            logger.warning(f"Batch mode: no usable response for {result['custom_id']}")
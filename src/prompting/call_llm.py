@@ -1,51 +1,171 @@
 import sys
+import json
+import queue
+import functools
 import signal
+import hashlib
 import logging
+import logging.handlers
 import absl.app
 import absl.flags
 import asyncio
 
 from src.envs import openai_keys, gemini_keys, deepseek_keys
 from src.adapters.client_factory import ClientFactory
+from src.prompting import batch_mode
 from src.prompting.renderedPromptRecord import RenderedPromptRecord
 
 logging.getLogger().setLevel(logging.ERROR)
 
+# Buffered logging: worker coroutines only enqueue records (cheap, no I/O),
+# a background listener thread drains the queue to stdout. This keeps
+# sys.stdout's lock out of the hot path at high --concurrency.
+log_queue = queue.Queue(-1)
+logger = logging.getLogger("call_llm")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+log_listener.start()
+
 FLAGS = absl.flags.FLAGS
 
+# Models the synchronous path can serve: deepseek through the chat
+# completions client, plus the gemini family through the multi-candidate
+# batch call. Other rows are skipped.
+SUPPORTED_MODELS = ("deepseek-chat",)
+
+def _model_supported(model):
+    return model in SUPPORTED_MODELS or model.startswith("gemini")
+
 absl.flags.DEFINE_string("record_path", None, "Path that contains the desired record")
 absl.flags.DEFINE_integer("ntimes", 1, "Number of times that the response will be generated")
 absl.flags.DEFINE_integer("concurrency", 6, "Number of rows to process concurrently.")
+absl.flags.DEFINE_boolean("dedup_prompts", False, "Fire byte-identical (config, message) rows once and share the responses.")
+absl.flags.DEFINE_boolean("batch_mode", False, "Run pending rows through the offline Batch API (24h window, half price).")
 absl.flags.mark_flag_as_required("record_path")
 
 
+class AdaptiveSemaphore():
+    """
+    Semaphore whose effective capacity follows additive-increase /
+    multiplicative-decrease: each success nudges the limit up, each
+    rate-limit error cuts it back. Waiters re-check the limit whenever a
+    slot is released, so capacity changes take effect as calls finish.
+    """
+
+    def __init__(self, limit, minimum=1):
+        self._target = float(limit)
+        self._minimum = minimum
+        self._in_use = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self):
+        return max(self._minimum, int(self._target))
+
+    def record_success(self):
+        self._target += 0.1
+
+    def record_rate_limit(self):
+        self._target = max(self._minimum, self._target * 0.7)
+
+    async def __aenter__(self):
+        async with self._condition:
+            while self._in_use >= self.limit:
+                await self._condition.wait()
+            self._in_use += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_use -= 1
+            self._condition.notify_all()
+
+
 class LlmCaller():
     def __init__(self, client_factory, concurrency_limit):
         self.client_factory = client_factory
         signal.signal(signal.SIGINT, self.handle_sigint)
         signal.signal(signal.SIGTERM, self.handle_sigint)
 
-        # Semaphore limits how many process_row tasks can run at once
-        self.semaphore = asyncio.Semaphore(concurrency_limit)
+        # Semaphore limits how many process_row tasks can run at once.
+        # The flag value is only the starting point: the semaphore adapts
+        # to the provider's actual rate-limit feedback while running.
+        self.semaphore = AdaptiveSemaphore(concurrency_limit)
         # Lock ensures only one task writes to the record/file at a time
         self.record_lock = asyncio.Lock()
-
-    async def generate_one_response(self, client, config, message):
+        # Tracks whether a save is already running on the worker thread
+        self._save_in_flight = False
+        # One partial(client.create_async, config) per unique config, so the
+        # hot loop doesn't rebuild the same call arguments row after row
+        self._req_factory = {}
+
+    def _dedup_key(self, row):
+        """Canonical hash of (config, message) used to group identical requests."""
+        config = {key: str(row[key]) for key in self.record.config_keys}
+        message = row["message"]
+        if hasattr(message, "content") and message.content:
+            text = message.content[0].text
+        else:
+            text = str(message)
+        canonical = json.dumps({**config, "message": text}, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def _save_async(self):
+        """
+        Dump the record on a worker thread so the event loop keeps serving
+        in-flight API calls. If a save is already running, skip this one:
+        the data stays in the record and the next save picks it up.
+        """
+        if self._save_in_flight:
+            return
+        self._save_in_flight = True
+        try:
+            await asyncio.to_thread(self.record.save_to_mirror_file)
+        finally:
+            self._save_in_flight = False
+
+    def _get_request_factory(self, client, config):
+        """Return the cached partial(client.create_async, config) for this config."""
+        key = (config["model"], frozenset(config.items()))
+        factory = self._req_factory.get(key)
+        if factory is None:
+            factory = functools.partial(client.create_async, dict(config))
+            self._req_factory[key] = factory
+        return factory
+
+    async def generate_one_response(self, request, message):
         """
-        Generates one response using the *provided* client.
+        Generates one response using the *provided* pre-bound request factory.
         This is critical for concurrency.
         """
         try:
             # We no longer use 'self.client', which was a race condition
-            return await client.create_async(config, message)
+            response = await request(message)
+            self.semaphore.record_success()
+            return response
         except Exception as e:
-            print(f"Error generating response: {e}")
+            if self._is_rate_limit_error(e):
+                self.semaphore.record_rate_limit()
+                logger.warning(f"Rate limited, backing off to concurrency={self.semaphore.limit}: {e}")
+            else:
+                logger.error(f"Error generating response: {e}")
             return None
 
-    async def process_row(self, i, row, ntimes):
+    @staticmethod
+    def _is_rate_limit_error(error):
+        """Match rate-limit errors across providers (OpenAI RateLimitError,
+        Gemini ResourceExhausted, generic HTTP 429) without importing them."""
+        text = f"{type(error).__name__} {error}".lower()
+        return "429" in text or "rate limit" in text or "ratelimit" in text or "resource exhausted" in text or "resourceexhausted" in text
+
+    async def process_row(self, i, row, ntimes, member_ids=None):
         """
         This function contains the logic to process a SINGLE row.
         It will be run concurrently for many rows, limited by the semaphore.
+        With --dedup_prompts, member_ids lists every messageId that shares
+        this row's (config, message) — the responses are broadcast to all.
         """
 
         # Wait for a "slot" to become available before proceeding
@@ -53,30 +173,45 @@ class LlmCaller():
             messageId = None
             try:
                 messageId = row["messageId"]
-                print(f"Processing row with messageId:\t\t\t{messageId} from {i+1}/{len(self.record.message_data)}")
+                if member_ids is None:
+                    member_ids = [messageId]
+                logger.debug(f"Processing row with messageId:\t\t\t{messageId} from {i+1}/{len(self.record.message_data)}")
 
-                response_count = self.record.count_responses(messageId)
+                response_count = self._counts.get(messageId, 0)
                 if response_count >= ntimes:
-                    print(f"Already generated {response_count} responses for messageId \t{messageId}\n")
+                    logger.debug(f"Already generated {response_count} responses for messageId \t{messageId}\n")
                     return  # This row is done
 
                 config = {key: row[key] for key in self.record.config_keys}
-                if config["model"] not in ["deepseek-chat"]:
-                    print(f"Skipping messageId {messageId} as model is not impl (model is {config['model']})")
+                if not _model_supported(config["model"]):
+                    logger.info(f"Skipping messageId {messageId} as model is not impl (model is {config['model']})")
                     return # This row is done
 
                 client = self.client_factory.get_client(config["model"])
                 message = row["message"]
 
-                print(f"Generating {ntimes - response_count} responses for messageId \t\t{messageId} and model {config['model']}")
-
-                coroutines = [
-                    # Pass the local client to each coroutine
-                    self.generate_one_response(client, config, message)
-                    for _ in range(ntimes - response_count)
-                ]
-
-                responses = await asyncio.gather(*coroutines, return_exceptions=True)
+                logger.info(f"Generating {ntimes - response_count} responses for messageId \t\t{messageId} and model {config['model']}")
+
+                responses = None
+                if config["model"].startswith("gemini"):
+                    # Gemini can return several candidates per request, so one
+                    # batched call replaces (ntimes - response_count) requests
+                    try:
+                        responses = await client.create_batch_async(
+                            config, [message] * (ntimes - response_count)
+                        )
+                    except Exception as e:
+                        logger.warning(f"Batched call failed for messageId {messageId}, falling back to per-request: {e}")
+
+                if responses is None:
+                    request = self._get_request_factory(client, config)
+                    coroutines = [
+                        # Pass the pre-bound request to each coroutine
+                        self.generate_one_response(request, message)
+                        for _ in range(ntimes - response_count)
+                    ]
+
+                    responses = await asyncio.gather(*coroutines, return_exceptions=True)
 
                 # Filter out None responses and exceptions
                 valid_responses = []
@@ -84,49 +219,66 @@ class LlmCaller():
                     if response is not None and not isinstance(response, Exception):
                         valid_responses.append(response)
                     elif isinstance(response, Exception):
-                        print(f"Exception in response generation: {response}")
+                        logger.error(f"Exception in response generation: {response}")
 
                 if not valid_responses:
-                    print(f"Failed to generate any responses for messageId \t{messageId}")
+                    logger.warning(f"Failed to generate any responses for messageId \t{messageId}")
                     return # This row is done
 
                 # Acquire the lock *before* modifying the shared record or saving the file
                 async with self.record_lock:
                     for response in valid_responses:
-                        self.record.add_response(messageId, response)
-                    self.record.save_to_mirror_file() # Save is now atomic with add
+                        for member_id in member_ids:
+                            self.record.add_response(member_id, response)
+                            self._counts[member_id] = self._counts.get(member_id, 0) + 1
+                    await self._save_async() # Save is now atomic with add
 
-                print(f"Successfully generated {len(valid_responses)} responses for messageId \t{messageId}")
-                print(f"Progress saved for messageId \t{messageId}\n")
+                logger.debug(f"Successfully generated {len(valid_responses)} responses for messageId \t{messageId}")
+                logger.debug(f"Progress saved for messageId \t{messageId}\n")
 
             except Exception as e:
-                print(f"Error processing messageId {messageId}: {e}")
+                logger.error(f"Error processing messageId {messageId}: {e}")
                 # --- 7. USE LOCK for data/file safety (even on error) ---
                 async with self.record_lock:
-                    self.record.save_to_mirror_file()
-                print(f"Progress saved after error for messageId \t{messageId}\n")
+                    await self._save_async()
+                logger.debug(f"Progress saved after error for messageId \t{messageId}\n")
                 return # Continue with next task
 
     # --- 8. REFACTOR: feed_into_llm now just creates tasks ---
     async def feed_into_llm(self, record, ntimes=1):
         self.record = record
+        # Precompute response counts once instead of scanning response_data per row
+        self._counts = self.record.build_response_count_map()
         tasks = []
 
-        # Create a task for *every* row, but don't await them yet
-        for i, row in enumerate(self.record.message_iter()):
-            tasks.append(
-                self.process_row(i, row, ntimes)
-            )
+        if FLAGS.dedup_prompts:
+            # Group byte-identical (config, message) rows and fire each request
+            # only once — the cheapest API call is the one we never make.
+            groups = {}
+            for row in self.record.message_iter():
+                groups.setdefault(self._dedup_key(row), []).append(row)
+            for i, group in enumerate(groups.values()):
+                member_ids = [r["messageId"] for r in group]
+                tasks.append(
+                    self.process_row(i, group[0], ntimes, member_ids)
+                )
+            logger.info(f"Deduplicated {len(self.record.message_data)} rows into {len(tasks)} unique requests")
+        else:
+            # Create a task for *every* row, but don't await them yet
+            for i, row in enumerate(self.record.message_iter()):
+                tasks.append(
+                    self.process_row(i, row, ntimes)
+                )
 
         # Now, run all tasks concurrently.
         # The semaphore inside process_row will limit the *actual*
         # concurrency to FLAGS.concurrency
-        print(f"Starting processing for {len(tasks)} rows with concurrency={FLAGS.concurrency}...")
+        logger.info(f"Starting processing for {len(tasks)} rows with initial concurrency={FLAGS.concurrency}...")
         await asyncio.gather(*tasks)
 
         # One final save to be safe
         async with self.record_lock:
-            self.record.save_to_mirror_file()
+            await self._save_async()
 
         return self.record
 
@@ -136,6 +288,8 @@ class LlmCaller():
         if hasattr(self, 'record') and self.record:
             # Note: This is synchronous, which is OK for a shutdown signal
             self.record.save_to_mirror_file()
+        # Flush any buffered log records before exiting
+        log_listener.stop()
         sys.exit(0)
 
 # Define a synchronous wrapper for absl.app.run
@@ -158,11 +312,22 @@ async def async_main_logic(argv):
     client_factory.gemini_keys = gemini_keys
     client_factory.deepseek_keys = deepseek_keys
 
+    if FLAGS.batch_mode:
+        # Offline runs trade latency for throughput and half the price.
+        # Rows are grouped per model so each batch goes to its own
+        # OpenAI-compatible adapter; unsupported models are skipped just
+        # like in the synchronous path.
+        record = await batch_mode.run_batch(record, ntimes, client_factory, SUPPORTED_MODELS)
+        print(f"Batch processing complete. Record saved to {record.new_path}")
+        return
+
     # --- 9. Pass the concurrency limit to the caller ---
     caller = LlmCaller(client_factory, FLAGS.concurrency)
     record = await caller.feed_into_llm(record, ntimes)
 
-    # Final save is already handled by feed_into_llm
+    # Final save is already handled by feed_into_llm; the Parquet mirror
+    # lets to_parquet.py skip the pickle round-trip entirely
+    record.save_parquet_mirror()
     print(f"All processing complete. Record saved to {record.new_path}")
 
 
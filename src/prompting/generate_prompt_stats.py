@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import absl.flags
@@ -13,9 +14,15 @@ absl.flags.mark_flag_as_required("record_folder")
 
 def main(_):
     record_folder = FLAGS.record_folder
-    records_path = [record_folder + f for f in os.listdir(record_folder) if ".pickle" in f]
+    with os.scandir(record_folder) as entries:
+        records_path = sorted(
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.endswith(".pickle")
+        )
     print(records_path)
-    records  = [RenderedPromptRecord.load_from_file_static(file) for file in records_path]
+    # Load records on a thread pool so the per-file read latencies overlap
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        records = list(executor.map(RenderedPromptRecord.load_from_file_static, records_path))
 
     token_counts = [np.sum(r.generate_token_count()) for r in records]
     token_count_all = np.sum(token_counts)
@@ -1,8 +1,13 @@
 import os
+import re
 import json
+import math
+from pathlib import Path
 from promptl_ai import Promptl
 
 import itertools
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 import absl.flags
@@ -11,6 +16,58 @@ from src.prompting.renderedPromptRecord import RenderedPromptRecord
 
 FLAGS = absl.flags.FLAGS
 
+# Precompiled whitespace run matcher for treat_message
+_WS = re.compile(r"\s+")
+
+# Gender agreement lookups used by enhance_traits; hoisted so the trait
+# loop doesn't rebuild them once per combination
+ARTIGO_MAPPING = {
+    "homem": "o",
+    "mulher": "a",
+    "não-binária": "a",
+}
+
+PRONOME_MAPPING = {
+    "homem": "ele",
+    "mulher": "ela",
+    "não-binária": "elu",
+}
+
+# One Promptl per worker process, built by the pool initializer so
+# _render_one stays picklable
+_worker_promptl = None
+
+def _init_render_worker():
+    global _worker_promptl
+    _worker_promptl = Promptl()
+
+# Per-worker cache: a template is compiled at most once per process even
+# though it is rendered for every trait combination
+_compiled_templates = {}
+
+def _compile_template(prompt_template):
+    compiled = _compiled_templates.get(prompt_template)
+    if compiled is None:
+        # Promptl versions with a separate compile step let us parse the
+        # template once; otherwise the raw template passes straight through
+        compile_fn = getattr(_worker_promptl.prompts, "compile", None)
+        compiled = compile_fn(prompt_template) if compile_fn is not None else prompt_template
+        _compiled_templates[prompt_template] = compiled
+    return compiled
+
+def _render_one(prompt_template, traits):
+    """Render a single trait combination; runs inside a worker process."""
+    messages, config = _worker_promptl.prompts.render(
+        prompt=_compile_template(prompt_template),
+        parameters=traits
+    )
+    return messages[1], config[1], traits
+
+def _render_pair(pair):
+    """Unpack a fused (template, traits) work item for executor.map."""
+    prompt_template, traits = pair
+    return _render_one(prompt_template, traits)
+
 # Definição das flags
 absl.flags.DEFINE_string("prompt_path", None, "Path that contains the desired template")
 absl.flags.DEFINE_string("trait_list_path",None,"Path of the traits JSON file - can be null")
@@ -22,29 +79,28 @@ absl.flags.mark_flag_as_required("trait_list_path")
 class PromptRenderGenerator():
     def __init__(self,traits, model_config_folder = "model_config/"):
         self.promptl = Promptl()
-        self.traits_comb = list(itertools.product(*traits.values()))
-        self.traits_keys = traits.keys()
+        self.trait_values = [list(values) for values in traits.values()]
+        self.traits_keys = tuple(traits.keys())
+        # Number of combinations for progress reporting, computed without
+        # materializing the cartesian product itself
+        self.n_traits_comb = math.prod(len(values) for values in self.trait_values)
         self.model_config_folder = model_config_folder
 
+    def traits_comb_iter(self):
+        """Stream the trait cartesian product; a fresh iterator per caller.
+
+        Materializing the full product up front costs O(n^k) tuples on the
+        heap before any rendering happens — streaming keeps it at O(k).
+        """
+        return itertools.product(*self.trait_values)
+
     def trait_comb_to_dict(self,trait_list):
         return dict(zip(self.traits_keys,trait_list))
 
     def enhance_traits(self,trait_dict):
-        artigo_mapping = {
-            "homem": "o",
-            "mulher": "a",
-            "não-binária": "a",
-        }
-
-        pronome_mapping = {
-            "homem": "ele",
-            "mulher": "ela",
-            "não-binária": "elu",
-        }
-
         trait = trait_dict.get("genero", "")
-        trait_dict["artigo"] = artigo_mapping.get(trait, "")
-        trait_dict["pronome"] = pronome_mapping.get(trait, "")
+        trait_dict["artigo"] = ARTIGO_MAPPING.get(trait, "")
+        trait_dict["pronome"] = PRONOME_MAPPING.get(trait, "")
         return trait_dict
 
     @staticmethod
@@ -54,8 +110,9 @@ class PromptRenderGenerator():
 
     def treat_message(self,message):
         text = message[0].content[0].text
-        text = " ".join(text.split())
-        message[0].content[0].text = text
+        # Single C-level regex pass instead of split() materializing a token
+        # list and join() re-scanning it
+        message[0].content[0].text = _WS.sub(" ", text).strip()
         return message
 
     def generate_prompt_from_template(self,prompt_template):
@@ -63,38 +120,59 @@ class PromptRenderGenerator():
         messages_list = []
         config_list = []
         trait_list = []
-        for trait_comb in tqdm(self.traits_comb):
-            traits = self.trait_comb_to_dict(trait_comb)
-            traits = self.enhance_traits(traits)
-            messages, config= self.promptl.prompts.render(
-                prompt=prompt_template,
-                parameters=traits
+        trait_dicts = [
+            self.enhance_traits(self.trait_comb_to_dict(trait_comb))
+            for trait_comb in self.traits_comb_iter()
+        ]
+        # Each render is independent and CPU-bound, so spread them across
+        # worker processes; chunksize amortizes the per-task pickling cost
+        with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                 initializer=_init_render_worker) as executor:
+            results = executor.map(
+                partial(_render_one, prompt_template), trait_dicts, chunksize=64
             )
-            messages_list.append(self.treat_message(messages[1]))
-            config_list.append(config[1])
-            trait_list.append(traits)
+            for message, config, traits in tqdm(results, total=len(trait_dicts)):
+                messages_list.append(self.treat_message(message))
+                config_list.append(config)
+                trait_list.append(traits)
         return messages_list, config_list, trait_list
     
     def generate_record(self,prompt_path):
-        configs = [
-            PromptRenderGenerator.read_from_file(self.model_config_folder + file) 
-            for file in os.listdir(self.model_config_folder)
-        ]
+        # scandir caches the stat info per entry (no per-file isfile stat)
+        # and DirEntry.path joins correctly whether or not the folder has a
+        # trailing separator; sort for a deterministic config order
+        config_entries = sorted(
+            (entry for entry in os.scandir(self.model_config_folder) if entry.is_file()),
+            key=lambda entry: entry.name,
+        )
+        configs = [Path(entry.path).read_text() for entry in config_entries]
         print(configs)
         prompt_template = PromptRenderGenerator.read_from_file(prompt_path)
         print("Generating prompts from template",prompt_path)
-        render = [
-            self.generate_prompt_from_template(config + prompt_template) 
-            for config in configs
+
+        # Fuse the configs × traits loops into one streaming pass: the work
+        # items are generated lazily, each per-config template is built
+        # exactly once, and rendered rows go straight into the record
+        # without ever materializing the full render output
+        templates = [config + prompt_template for config in configs]
+        trait_dicts = [
+            self.enhance_traits(self.trait_comb_to_dict(trait_comb))
+            for trait_comb in self.traits_comb_iter()
         ]
-        # messages_list, configs_list, trait_list = zip(*render)
+        pairs = (
+            (template, traits)
+            for template in templates
+            for traits in trait_dicts
+        )
+        total = len(templates) * len(trait_dicts)
+
         record = RenderedPromptRecord(prompt_template, prompt_path)
-        # Iterate directly over the 'render' object
-        for message_contents, config_dicts, trait_values in render:
-            # Assuming 'message_content' is already the string/content you want,
-            # and not a list like message[0] was implying.
-            for message_content, config_dict, trait_value in zip(message_contents, config_dicts, trait_values):
-                record.add_message(prompt_template, config_dict, trait_value, message_content[0])
+        with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                 initializer=_init_render_worker) as executor:
+            results = executor.map(_render_pair, pairs, chunksize=64)
+            for message, config_dict, trait_value in tqdm(results, total=total):
+                message = self.treat_message(message)
+                record.add_message(prompt_template, config_dict, trait_value, message[0])
 
         return record
 
@@ -1,29 +1,124 @@
+import mmap
 import pickle
+import hashlib
 import os
 import warnings
 import pandas as pd
 from token_count import TokenCount
-from uuid import uuid5,NAMESPACE_DNS
+from uuid import UUID,NAMESPACE_DNS
 
 template_suffix = ".tmplt"
 
+_NAMESPACE_BYTES = NAMESPACE_DNS.bytes
+
+def _uuid5_fast(name):
+    """uuid5(NAMESPACE_DNS, name) via a direct sha1 call.
+
+    Bit-identical to uuid5 (same namespace digest, version and variant
+    bits) but skips the per-call namespace copying and argument plumbing;
+    sha1 itself runs as OpenSSL C code.
+    """
+    digest = hashlib.sha1(_NAMESPACE_BYTES + name.encode("utf-8")).digest()
+    return UUID(bytes=digest[:16], version=5)
+
 class RenderedPromptRecord():
     def __init__(self,original_prompt,prompt_path):
         self.original_prompt = original_prompt
         self.prompt_path = prompt_path
 
         self.config_keys = {}
-        self.message_data = pd.DataFrame()
 
+        # Appends go into plain row lists; the DataFrames are materialized
+        # lazily by the properties below. Concatenating one row at a time
+        # rebuilds the whole frame per insert, which is quadratic over big
+        # trait cartesian products.
+        self._message_rows = []
+        self._message_df = pd.DataFrame()
+
+        self._response_rows = []
         # Make the default response a empty String
-        self.response_data = pd.DataFrame(columns=["messageId","response"])
-        self.response_data["response"] = self.response_data["response"].astype(str)
+        self._response_df = pd.DataFrame(columns=["messageId","response"])
+        self._response_df["response"] = self._response_df["response"].astype(str)
 
-        self.udpipe_data = pd.DataFrame()
+        self._udpipe_rows = []
+        self._udpipe_df = pd.DataFrame()
+
+        # Memoized reprs for messageId hashing: the same few config and
+        # trait values repeat across rows, keyed by value below
+        self._str_cache = {}
+
+    @staticmethod
+    def _materialize(df, rows):
+        """Fold any pending row dicts into the DataFrame with a single concat."""
+        if not rows:
+            return df
+        pending = pd.DataFrame(rows)
+        rows.clear()
+        if df.empty:
+            return pending
+        return pd.concat([df, pending], ignore_index=True)
+
+    @property
+    def message_data(self):
+        self._message_df = self._materialize(self._message_df, self._message_rows)
+        return self._message_df
+
+    @property
+    def response_data(self):
+        self._response_df = self._materialize(self._response_df, self._response_rows)
+        return self._response_df
+
+    @property
+    def udpipe_data(self):
+        self._udpipe_df = self._materialize(self._udpipe_df, self._udpipe_rows)
+        return self._udpipe_df
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The repr memo is rebuildable scratch space; keep it out of the pickle
+        state.pop("_str_cache", None)
+        return state
+
+    def __setstate__(self, state):
+        # Records pickled before the list-backed rewrite stored the
+        # DataFrames directly under the public attribute names
+        for old, new in (("message_data", "_message_df"),
+                         ("response_data", "_response_df"),
+                         ("udpipe_data", "_udpipe_df")):
+            if old in state:
+                state[new] = state.pop(old)
+        state.setdefault("_message_rows", [])
+        state.setdefault("_response_rows", [])
+        state.setdefault("_udpipe_rows", [])
+        state.setdefault("_str_cache", {})
+        self.__dict__.update(state)
+
+    def _cached_str(self, obj):
+        # Keyed by the dict's ordered items: the render workers hand back
+        # freshly unpickled dicts, so object identity never repeats here
+        # but value equality does. Using the insertion-ordered items keeps
+        # str(dict) parity, which the messageId hashes depend on.
+        try:
+            key = tuple(obj.items())
+            cached = self._str_cache.get(key)
+        except (AttributeError, TypeError):
+            return str(obj)
+        if cached is None:
+            cached = str(obj)
+            self._str_cache[key] = cached
+        return cached
 
     def add_message(self,original_prompt,config,trait,message):
-        message_id = uuid5(NAMESPACE_DNS, 
-                           original_prompt + str(trait) + str(config))
+        message_id = _uuid5_fast(
+            original_prompt + self._cached_str(trait) + self._cached_str(config)
+        )
+
+        # Flatten the promptl object to its text up front: the column then
+        # holds plain strings, which pandas/pickle/Arrow handle natively,
+        # and downstream code stops unwrapping .content[0].text per row.
+        # (Readers keep their fallbacks for records saved before this.)
+        if hasattr(message, "content") and message.content:
+            message = message.content[0].text
 
         message_record = {
             "messageId": message_id,
@@ -32,56 +127,66 @@ class RenderedPromptRecord():
             "original_prompt": original_prompt,
             **config  # Unpack configs into columns
         }
-        self.message_data = pd.concat(
-            [self.message_data, pd.DataFrame([message_record])], ignore_index=True
-        )
+        self._message_rows.append(message_record)
         self.config_keys = list(config.keys())
-        return self.message_data
 
     def add_response(self,messageId, response):
         response_record = {
             "messageId": messageId,
             "response": response
         }
-        self.response_data = pd.concat(
-            [self.response_data, pd.DataFrame([response_record])], ignore_index=True
-        )
-        return self.response_data
-    
+        self._response_rows.append(response_record)
+
     def add_udpipe(self,responseId, response,stats):
         response_record = {
             "responseId": responseId,
             "udpipe_result": response,
             **stats
         }
+        self._udpipe_rows.append(response_record)
 
-        self.udpipe_data = pd.concat(
-            [self.udpipe_data, pd.DataFrame([response_record])], ignore_index=True
-        )
-        return self.udpipe_data
+    def build_udpipe_done_set(self):
+        # Set of responseIds that already have udpipe output, built in one
+        # pass so callers don't re-scan the frame per row
+        done = {row["responseId"] for row in self._udpipe_rows}
+        if not self._udpipe_df.empty and "responseId" in self._udpipe_df.columns:
+            done.update(self._udpipe_df["responseId"].tolist())
+        return done
 
     def count_udpipe(self,responseId):
-        # Check if the udpipe data is empty
-        if self.udpipe_data.empty:
-            return 0
-        # Count the number of udpipe results for a given responseId
-        count = self.udpipe_data[self.udpipe_data["responseId"] == responseId].shape[0]
+        # Count pending rows first so we don't force a materialization
+        count = sum(1 for row in self._udpipe_rows if row["responseId"] == responseId)
+        if not self._udpipe_df.empty:
+            count += int((self._udpipe_df["responseId"] == responseId).sum())
         return count
 
     def generate_responseId(self):
         # Generate a unique ID for the response
         if self.response_data.empty:
             return
-        # For each response, the UUID is the messageId + response
-        self.response_data["responseId"] = self.response_data["messageId"].astype(str) + self.response_data["response"].astype(str)
-        self.response_data["responseId"] = self.response_data["responseId"].apply(
-            lambda x: uuid5(NAMESPACE_DNS, x)
-        )
+        # For each response, the UUID is the messageId + response.
+        # Build the payloads in one vectorized string pass, then hash the
+        # plain Python list — sha1 runs in C and skipping .apply removes
+        # the per-row pandas dispatch
+        payloads = (
+            self.response_data["messageId"].astype(str)
+            + self.response_data["response"].astype(str)
+        ).tolist()
+        self.response_data["responseId"] = [_uuid5_fast(payload) for payload in payloads]
         return self.response_data
 
+    def build_response_count_map(self):
+        # Build {messageId: response count} in a single pass over response_data,
+        # so callers don't re-scan the DataFrame once per row
+        if self.response_data.empty:
+            return {}
+        return self.response_data["messageId"].value_counts().to_dict()
+
     def count_responses(self,messageId):
-        # Count the number of responses for a given messageId
-        count = self.response_data[self.response_data["messageId"] == messageId].shape[0]
+        # Count pending rows first so we don't force a materialization
+        count = sum(1 for row in self._response_rows if row["messageId"] == messageId)
+        if not self._response_df.empty:
+            count += int((self._response_df["messageId"] == messageId).sum())
         return count
 
     def save_to_mirror_file(self):
@@ -95,44 +200,110 @@ class RenderedPromptRecord():
         prefix = rendered_dir + "/" 
         suffix = self.prompt_path.split("/")[-1].replace(template_suffix, ".pickle")
         self.new_path = prefix + suffix
-        pickle.dump(self, open(self.new_path,"wb"))
+        # Protocol 5 handles the DataFrame buffers out-of-band, which makes
+        # dumps of large records noticeably faster and smaller than the default;
+        # the 1 MiB buffer keeps the dump from flushing on every small frame
+        with open(self.new_path, "wb", buffering=1<<20) as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
         assert os.path.exists(self.new_path), f"Failed to save file at {self.new_path}"
 
+    def save_parquet_mirror(self):
+        """Write the merged tabular view as Parquet beside the pickle.
+
+        The pickle stays canonical (message objects are not Arrow types),
+        but consumers that only need the tabular data — to_parquet.py in
+        particular — can then read Arrow directly instead of paying a
+        full pickle round-trip per record.
+        """
+        if not hasattr(self, "new_path"):
+            self.save_to_mirror_file()
+        merged = self.get_merged_data()
+        # Keep only the message text; the promptl objects don't serialize
+        if "message" in merged.columns:
+            merged["message"] = merged["message"].apply(
+                lambda msg: msg.content[0].text if hasattr(msg, "content") and msg.content else str(msg)
+            )
+        # Expand trait dicts into flat columns; Arrow has no dict-object type
+        if "trait" in merged.columns:
+            trait_df = pd.json_normalize(merged["trait"])
+            merged = pd.concat([merged.drop(columns=["trait"]), trait_df], axis=1)
+        for col in merged.columns:
+            if merged[col].dtype == "object":
+                merged[col] = merged[col].astype(str)
+        parquet_path = self.new_path.replace(".pickle", ".merged.parquet")
+        merged.to_parquet(parquet_path, index=False)
+        return parquet_path
+
     @staticmethod
     def load_from_file_static(path):
-        return pickle.load(open(path,"rb"))
+        # mmap the pickle so the OS page cache backs (and shares) the bytes;
+        # pickle.loads reads the mapping directly, with no user-space copy
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                return pickle.loads(mm)
 
     def load_from_file(self,path):
-        return pickle.load(open(path,"rb"))
+        with open(path, "rb", buffering=1<<20) as f:
+            return pickle.load(f)
 
     def generate_token_count(self):
-        token_counts = []
-        
-        for _, row in self.message_data.iterrows():  # Iterate over DataFrame rows
-            message = row["message"]
-            model_name = row.get("model", None)  # Get model name if it exists in configs
+        if self.message_data.empty:
+            return []
 
+        def message_text(message):
             if hasattr(message, "content") and message.content:
-                text = message.content[0].text  # Extract the actual text
-            else:
-                text = str(message)  # Fallback if message is not in expected format
-            
-            tc = TokenCount(model_name=model_name)  # Initialize TokenCount with model
-            token_counts.append(tc.num_tokens_from_string(text))  # Compute token count
+                return message.content[0].text  # Extract the actual text
+            return str(message)  # Fallback if message is not in expected format
+
+        texts = [message_text(message) for message in self.message_data["message"]]
+        if "model" in self.message_data.columns:
+            models = list(self.message_data["model"])
+        else:
+            models = [None] * len(texts)
+
+        # Group rows by model so each tokenizer is built once and every group
+        # is encoded in a single batched call instead of one call per row
+        by_model = {}
+        for i, model_name in enumerate(models):
+            by_model.setdefault(model_name, []).append(i)
+
+        token_counts = [0] * len(texts)
+        for model_name, indices in by_model.items():
+            counts = self._count_tokens_batch(model_name, [texts[i] for i in indices])
+            for i, count in zip(indices, counts):
+                token_counts[i] = count
 
         return token_counts
 
+    @staticmethod
+    def _count_tokens_batch(model_name, texts):
+        try:
+            # tiktoken's Rust encode_batch releases the GIL and parallelizes
+            # tokenization across cores
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(model_name)
+            except (KeyError, ValueError):
+                encoding = tiktoken.get_encoding("cl100k_base")
+            # encode_ordinary_batch skips the special-token scan on top of
+            # running the whole batch Rust-side
+            batches = encoding.encode_ordinary_batch(texts, num_threads=os.cpu_count())
+            return [len(tokens) for tokens in batches]
+        except ImportError:
+            # Fall back to the per-string counter, still one instance per batch
+            tc = TokenCount(model_name=model_name)
+            return [tc.num_tokens_from_string(text) for text in texts]
+
     def message_iter(self):
         """Iterator that yields each row in message_data as a dictionary."""
-        # Iterate over the rows of message_data
-        for _, row in self.message_data.iterrows():
-            yield row.to_dict()
+        # to_dict(orient="records") converts the frame in one pass instead
+        # of boxing every cell row-by-row through iterrows
+        yield from self.message_data.to_dict(orient="records")
 
     def response_iter(self):
         """Iterator that yields each row in response_data as a dictionary."""
-        # Iterate over the rows of response_data
-        for _, row in self.response_data.iterrows():
-            yield row.to_dict()
+        yield from self.response_data.to_dict(orient="records")
 
     def get_merged_data(self):
         """Returns the merged data as a DataFrame."""
@@ -173,26 +344,31 @@ class RenderedPromptRecord():
         """Iterator that yields each row in message_data and response_data as a dictionary."""
         # Get the merged data
         merged_data = self.get_merged_data()
-        # Iterate over the rows of the merged DataFrame
-        for _, row in merged_data.iterrows():
-            yield row.to_dict()
+        yield from merged_data.to_dict(orient="records")
 
 
     def __str__(self):
         """Returns a readable string representation of the object."""
-        # Convert the 'message' column using `.content[0].text`
-        if not self.message_data.empty:
-            self.message_data["message_text"] = self.message_data["message"].apply(
-                lambda msg: msg.content[0].text if hasattr(msg, "content") and msg.content else str(msg)
-            )
+        # Render a bounded head only — dumping every row allocates the whole
+        # record as text — and never mutate the stored frames on the way
+        max_rows = 20
+
+        message_head = self.message_data.head(max_rows)
+        if not message_head.empty:
+            # Convert the 'message' column using `.content[0].text`
+            message_head = message_head.assign(
+                message_text=message_head["message"].map(
+                    lambda msg: msg.content[0].text if hasattr(msg, "content") and msg.content else str(msg)
+                )
+            )[["messageId", "message_text"]]
 
         return (
             f"RenderedPromptRecord:\n"
             f"Original Prompt: {self.original_prompt}\n"
             f"Prompt Path: {self.prompt_path}\n\n"
-            f"Message Data:\n{self.message_data[['messageId','message_text']].to_string(index=False)}\n\n"
-            f"Response Data:\n{self.response_data.to_string(index=False)}"
-            f"\n\nUDPipe Data:\n{self.udpipe_data.to_string(index=False)}"
+            f"Message Data ({len(self.message_data)} rows, first {max_rows}):\n{message_head.to_string(index=False)}\n\n"
+            f"Response Data ({len(self.response_data)} rows, first {max_rows}):\n{self.response_data.head(max_rows).to_string(index=False)}"
+            f"\n\nUDPipe Data ({len(self.udpipe_data)} rows, first {max_rows}):\n{self.udpipe_data.head(max_rows).to_string(index=False)}"
 
         )
 
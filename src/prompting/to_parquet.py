@@ -1,7 +1,6 @@
 from src.prompting.renderedPromptRecord import RenderedPromptRecord
 from tqdm.auto import tqdm
 import pandas as pd
-import numpy as np
 import absl.flags
 import absl.app
 import os
@@ -13,16 +12,38 @@ absl.flags.DEFINE_string("record_folder", None, "Path that contains the desired
 absl.flags.mark_flag_as_required("record_folder")
 def main(_):
     record_folder = FLAGS.record_folder
-    records_path = [record_folder + f for f in os.listdir(record_folder) if ".pickle" in f]
-    records  = [RenderedPromptRecord.load_from_file_static(file) for file in tqdm(records_path, desc="Loading records")]
-    dfs = pd.DataFrame()
-    for record in tqdm(records, desc="Processing records"):
-        df = pd.DataFrame(record.get_merged_data())
-        dfs = pd.concat([dfs, df], ignore_index=True)
-    analysis_df = pd.json_normalize(dfs['trait'])
-    dfs = pd.concat([dfs, analysis_df], axis=1)
-
-    # Convert object columns to string
+    with os.scandir(record_folder) as entries:
+        records_path = sorted(
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.endswith(".pickle")
+        )
+    # Read each record through its parquet mirror, but only trust a mirror
+    # that is at least as new as its pickle: call_udpipe and interrupted
+    # LLM runs rewrite the pickle alone, and a stale mirror would silently
+    # drop the udpipe columns and late responses. Stale or missing mirrors
+    # are refreshed from the pickle first.
+    frames = []
+    for pickle_path in tqdm(records_path, desc="Loading records"):
+        parquet_path = pickle_path.replace(".pickle", ".merged.parquet")
+        if (not os.path.exists(parquet_path)
+                or os.path.getmtime(parquet_path) < os.path.getmtime(pickle_path)):
+            record = RenderedPromptRecord.load_from_file_static(pickle_path)
+            record.new_path = pickle_path  # mirror lands beside this pickle
+            record.save_parquet_mirror()
+        frames.append(pd.read_parquet(parquet_path))
+    # Collect every frame first and concat once — concatenating inside
+    # the loop re-copies the accumulated data per record
+    dfs = pd.concat(frames, ignore_index=True, copy=False)
+
+    # Config columns (model etc.) carry a handful of unique values each —
+    # make them categorical so pyarrow dictionary-encodes them on write and
+    # downstream groupbys work on codes instead of strings
+    payload_cols = {"messageId", "responseId", "message", "response", "original_prompt", "udpipe_result"}
+    for col in dfs.columns:
+        if dfs[col].dtype == 'object' and col not in payload_cols:
+            dfs[col] = dfs[col].astype(str).astype('category')
+
+    # Stringify only the genuine payload columns; categoricals stay as-is
     for col in dfs.columns:
         if dfs[col].dtype == 'object':
             # Handle potential lists or other non-scalar data by converting to string
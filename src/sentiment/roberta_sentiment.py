@@ -16,6 +16,17 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Convert sentiment labels to standardized format
+LABEL_MAPPING = {
+    "POSITIVE": "positive",
+    "NEGATIVE": "negative", 
+    "NEUTRAL": "neutral",
+    "LABEL_0": "negative",  # Some models use these labels
+    "LABEL_1": "neutral",
+    "LABEL_2": "positive",
+    "UNKNOWN": "unknown"
+}
+
 
 def setup_roberta_sentiment():
     """Setup RoBERTa sentiment analysis pipeline for Portuguese."""
@@ -29,16 +40,32 @@ def setup_roberta_sentiment():
         
         logger.info(f"Loading RoBERTa model: {model_name}")
         
+        use_cuda = torch.cuda.is_available()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_name,
+            # Half precision on GPU: tensor-core GEMMs and half the DRAM
+            # traffic; CPU inference stays FP32
+            torch_dtype=torch.float16 if use_cuda else torch.float32,
+        )
+        
         sentiment_pipeline = pipeline(
             "sentiment-analysis",
-            model=model_name,
-            tokenizer=model_name,
-            device=0 if torch.cuda.is_available() else -1,
+            model=model,
+            tokenizer=tokenizer,
+            device=0 if use_cuda else -1,
             truncation=True,
             max_length=512,
             return_all_scores=True  # This returns scores for all classes
         )
         
+        if use_cuda:
+            # Compile once so repeated forwards skip the Python dispatch and
+            # run fused kernels; reduce-overhead is tuned for small batches
+            sentiment_pipeline.model = torch.compile(
+                sentiment_pipeline.model, mode="reduce-overhead", fullgraph=False
+            )
+        
         return sentiment_pipeline
         
     except Exception as e:
@@ -54,6 +81,98 @@ def setup_roberta_sentiment():
         return sentiment_pipeline
 
 
+def _id2label_array(model):
+    """Label lookup table; index -1 (failed batch) decodes to UNKNOWN."""
+    id2label = model.config.id2label
+    labels = [id2label[i] for i in range(len(id2label))] + ["UNKNOWN"]
+    return np.array(labels, dtype=object)
+
+
+def iter_sentiment_batches(texts, sentiment_pipeline, batch_size=32):
+    """
+    Run sentiment inference and yield per-batch results as they complete.
+    
+    Yields (row_indices, label_ids, scores) triples of NumPy arrays, where
+    row_indices are the positions of the batch's texts in the original
+    list, label_ids index model.config.id2label (-1 marks a failed batch),
+    and scores are the winning softmax probabilities. Batches come out in
+    length-sorted order, so callers that need the original order must
+    scatter by row_indices (see analyze_sentiment_batch).
+    
+    Args:
+        texts (list): List of text strings to analyze
+        sentiment_pipeline: Hugging Face sentiment pipeline
+        batch_size (int): Batch size for processing
+    """
+    tokenizer = sentiment_pipeline.tokenizer
+    model = sentiment_pipeline.model
+    device = sentiment_pipeline.device
+
+    # Stage 1: tokenize the whole corpus once with the Rust batch API.
+    # The inner loop below only pads each bucket and runs the model, so
+    # tokenization is out of the hot path entirely.
+    encodings = tokenizer(list(texts), padding=False, truncation=True, max_length=512)
+
+    # Sort by token length so every batch pads to near-uniform lengths;
+    # in original order, one long response makes the whole batch pay its
+    # padding in wasted attention FLOPs
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+    order = np.argsort(lengths)
+
+    # One warmup forward up front lets torch.compile capture the graph
+    # outside the timed loop (padded to the same bucket grid as the real
+    # batches so the captured shape actually recurs)
+    try:
+        warm = tokenizer(["aquecimento"] * min(batch_size, 8), padding=True,
+                         truncation=True, pad_to_multiple_of=64,
+                         return_tensors="pt")
+        with torch.inference_mode():
+            model(**{k: v.to(device) for k, v in warm.items()})
+    except Exception as e:
+        logger.debug(f"Warmup batch failed: {e}")
+
+    # Stage 2: pad + forward per length-sorted bucket; inference_mode skips
+    # all autograd bookkeeping
+    with torch.inference_mode():
+        for i in tqdm(range(0, len(order), batch_size), desc="Processing sentiment"):
+            idx = order[i:i + batch_size]
+
+            try:
+                features = [
+                    {"input_ids": encodings["input_ids"][j],
+                     "attention_mask": encodings["attention_mask"][j]}
+                    for j in idx
+                ]
+                # Pad up to the next multiple of 64 (512 is the truncation
+                # cap), so batches present at most 8 distinct sequence
+                # lengths — reduce-overhead's CUDA-graph capture would
+                # otherwise recompile for nearly every bucket's own max
+                batch = tokenizer.pad(features, return_tensors="pt",
+                                      pad_to_multiple_of=64)
+                if device.type == "cuda":
+                    # Pinned host buffers make the H2D copy an async DMA that
+                    # overlaps with the previous batch's compute
+                    batch = {k: v.pin_memory().to(device, non_blocking=True)
+                             for k, v in batch.items()}
+                else:
+                    batch = {k: v.to(device) for k, v in batch.items()}
+                logits = model(**batch).logits
+                # Stay columnar: argmax + gather give the winning ids and
+                # probabilities as two typed arrays — no per-row dicts
+                probs = torch.softmax(logits.float(), dim=-1)
+                top = probs.argmax(-1)
+                score = probs.gather(-1, top[:, None]).squeeze(-1)
+                label_ids = top.cpu().numpy().astype(np.int32)
+                scores = score.cpu().numpy().astype(np.float32)
+            except Exception as e:
+                logger.warning(f"Error processing batch {i//batch_size}: {e}")
+                # Mark the failed batch with the UNKNOWN sentinel
+                label_ids = np.full(len(idx), -1, dtype=np.int32)
+                scores = np.zeros(len(idx), dtype=np.float32)
+
+            yield idx, label_ids, scores
+
+
 def analyze_sentiment_batch(texts, sentiment_pipeline, batch_size=32):
     """
     Analyze sentiment for a batch of texts.
@@ -64,85 +183,145 @@ def analyze_sentiment_batch(texts, sentiment_pipeline, batch_size=32):
         batch_size (int): Batch size for processing
     
     Returns:
-        list: List of sentiment results with labels and scores
+        tuple: (labels, scores) NumPy arrays in the original text order
     """
-    results = []
-    
-    # Process in batches to avoid memory issues
-    for i in tqdm(range(0, len(texts), batch_size), desc="Processing sentiment"):
-        batch = texts[i:i + batch_size]
-        
-        try:
-            batch_results = sentiment_pipeline(batch)
-            results.extend(batch_results)
-        except Exception as e:
-            logger.warning(f"Error processing batch {i//batch_size}: {e}")
-            # Add empty results for failed batch
-            for _ in batch:
-                results.append({"label": "UNKNOWN", "score": 0.0})
-    
-    return results
+    labels_idx = np.full(len(texts), -1, dtype=np.int32)
+    scores = np.zeros(len(texts), dtype=np.float32)
+    for idx, batch_ids, batch_scores in iter_sentiment_batches(texts, sentiment_pipeline, batch_size):
+        # Scatter the batch back to the original text order
+        labels_idx[idx] = batch_ids
+        scores[idx] = batch_scores
+    # The -1 sentinel picks the trailing UNKNOWN entry of the lookup table
+    return _id2label_array(sentiment_pipeline.model)[labels_idx], scores
 
 
-def perform_sentiment_analysis(text_column="response", data_file="../../data/merged_data.parquet"):
+def perform_sentiment_analysis(text_column="response", data_file="../../data/merged_data.parquet",
+                               output_file=None, batch_size=32):
     """
     Perform sentiment analysis on text data using RoBERTa.
     
     Args:
         text_column (str): Column name containing text to analyze
         data_file (str): Path to the parquet data file
+        output_file (str): When given, stream enriched rows to this parquet
+            file batch by batch (bounded memory; rows land in inference
+            order) instead of materializing the full result set
+        batch_size (int): Inference batch size
     
     Returns:
-        pandas.DataFrame: DataFrame with original data plus sentiment columns
+        pandas.DataFrame: DataFrame with original data plus sentiment columns,
+        or None when streaming to output_file
     """
-    # Load data
-    logger.info(f"Loading data from {data_file}...")
-    df = pd.read_parquet(data_file)
+    if output_file is not None:
+        # Fully streamed: the input is scanned in row-group sized chunks and
+        # enriched rows are flushed per batch, so neither side of the file
+        # has to fit in memory
+        _stream_sentiment_from_parquet(data_file, text_column, output_file, batch_size)
+        return None
     
-    model_data = df.copy()
+    # Load data (read_parquet already hands us a private frame; no copy)
+    logger.info(f"Loading data from {data_file}...")
+    model_data = pd.read_parquet(data_file)
     logger.info(f"Processing all data: {len(model_data)} records")
     
     # Check if text column exists
     if text_column not in model_data.columns:
         raise ValueError(f"Text column '{text_column}' not found in data")
     
-    # Clean text data
+    # Clean text data: one mask pass instead of fillna + a second length
+    # scan over the whole column
     logger.info("Cleaning text data...")
-    model_data[text_column] = model_data[text_column].fillna("")
-    model_data = model_data[model_data[text_column].str.len() > 0]
+    col = model_data[text_column]
+    mask = col.notna() & col.str.len().gt(0)
+    model_data = model_data.loc[mask].copy()
+    # Arrow-backed string dtype keeps later .str ops out of object-per-row land
+    model_data[text_column] = model_data[text_column].astype("string")
     
     # Setup sentiment pipeline
     sentiment_pipeline = setup_roberta_sentiment()
     
-    # Analyze sentiment
+    # Analyze sentiment. Templated answers repeat verbatim, so factorize
+    # first and run inference on the unique strings only, then scatter the
+    # results back through the codes.
     logger.info("Starting sentiment analysis...")
-    texts = model_data[text_column].tolist()
+    codes, uniques = pd.factorize(model_data[text_column])
+    logger.info(f"Running inference on {len(uniques)} unique texts ({len(codes)} rows)")
     
-    sentiment_results = analyze_sentiment_batch(texts, sentiment_pipeline)
+    unique_labels, unique_scores = analyze_sentiment_batch(
+        uniques.astype(str).tolist(), sentiment_pipeline, batch_size
+    )
     
-    # Add results to dataframe
+    # Add results to dataframe (columnar assignment, no per-row unpacking)
     logger.info("Adding sentiment results to dataframe...")
-    model_data["sentiment_label"] = [result["label"] for result in sentiment_results]
-    model_data["sentiment_score"] = [result["score"] for result in sentiment_results]
-    
-    # Convert sentiment labels to standardized format
-    label_mapping = {
-        "POSITIVE": "positive",
-        "NEGATIVE": "negative", 
-        "NEUTRAL": "neutral",
-        "LABEL_0": "negative",  # Some models use these labels
-        "LABEL_1": "neutral",
-        "LABEL_2": "positive",
-        "UNKNOWN": "unknown"
-    }
-    
-    model_data["sentiment_normalized"] = model_data["sentiment_label"].map(
-        lambda x: label_mapping.get(x, x.lower())
+    model_data["sentiment_label"] = unique_labels[codes]
+    model_data["sentiment_score"] = unique_scores[codes]
+    
+    # Normalize on the categories (a handful of labels) instead of mapping a
+    # Python lambda over every row
+    labels = model_data["sentiment_label"].astype("category")
+    model_data["sentiment_normalized"] = labels.cat.rename_categories(
+        [LABEL_MAPPING.get(c, c.lower()) for c in labels.cat.categories]
     )
     
     return model_data
 
 
+def _stream_sentiment_to_parquet(model_data, texts, sentiment_pipeline, output_file,
+                                 batch_size=32, writer=None):
+    """Flush each completed inference batch straight to a parquet writer.
+    
+    Keeps the working set at one batch regardless of corpus size; the rows
+    are written in inference (length-sorted) order. Returns the writer so
+    chunked callers can keep appending — the caller owns closing it.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    id2label = _id2label_array(sentiment_pipeline.model)
+    for idx, label_ids, scores in iter_sentiment_batches(texts, sentiment_pipeline, batch_size):
+        batch_df = model_data.iloc[idx].copy()
+        batch_labels = id2label[label_ids]
+        batch_df["sentiment_label"] = batch_labels
+        batch_df["sentiment_score"] = scores
+        batch_df["sentiment_normalized"] = [
+            LABEL_MAPPING.get(label, label.lower()) for label in batch_labels
+        ]
+        table = pa.Table.from_pandas(batch_df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_file, table.schema, compression="zstd")
+        writer.write_table(table)
+    return writer
+
+
+def _stream_sentiment_from_parquet(data_file, text_column, output_file,
+                                   batch_size=32, scan_batch_size=10_000):
+    """End-to-end streaming: scan the input parquet in chunks, run inference,
+    and flush enriched rows through a single writer."""
+    import pyarrow.dataset as ds
+    
+    sentiment_pipeline = setup_roberta_sentiment()
+    dataset = ds.dataset(data_file, format="parquet")
+    
+    writer = None
+    try:
+        for record_batch in dataset.scanner(batch_size=scan_batch_size).to_batches():
+            chunk = record_batch.to_pandas()
+            if text_column not in chunk.columns:
+                raise ValueError(f"Text column '{text_column}' not found in data")
+            col = chunk[text_column]
+            chunk = chunk.loc[col.notna() & col.str.len().gt(0)].copy()
+            if chunk.empty:
+                continue
+            texts = chunk[text_column].astype(str).tolist()
+            writer = _stream_sentiment_to_parquet(
+                chunk, texts, sentiment_pipeline, output_file, batch_size, writer
+            )
+    finally:
+        if writer is not None:
+            writer.close()
+    logger.info(f"Streamed results saved to: {output_file}")
+
+
 def generate_sentiment_summary(df):
     """
     Generate summary statistics for sentiment analysis.
@@ -172,6 +351,10 @@ def main():
                         help="Column name containing text to analyze")
     parser.add_argument("--output_dir", type=str, default="sentiment_results",
                         help="Output directory for results")
+    parser.add_argument("--batch_size", type=int, default=32,
+                        help="Inference batch size")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream results to parquet batch by batch (bounded memory)")
     
     args = parser.parse_args()
     
@@ -179,15 +362,31 @@ def main():
     os.makedirs(args.output_dir, exist_ok=True)
     
     try:
-        # Perform sentiment analysis
-        results_df = perform_sentiment_analysis(
-            text_column=args.text_column,
-            data_file=args.input_file
-        )
-        
-        # Save detailed results
         output_file = os.path.join(args.output_dir, f"sentiment_analysis.parquet")
-        results_df.to_parquet(output_file, index=False)
+        
+        if args.stream:
+            # Rows are flushed per batch; reload only the sentiment columns
+            # for the summary statistics
+            perform_sentiment_analysis(
+                text_column=args.text_column,
+                data_file=args.input_file,
+                output_file=output_file,
+                batch_size=args.batch_size
+            )
+            results_df = pd.read_parquet(
+                output_file,
+                columns=["sentiment_label", "sentiment_score", "sentiment_normalized"]
+            )
+        else:
+            # Perform sentiment analysis
+            results_df = perform_sentiment_analysis(
+                text_column=args.text_column,
+                data_file=args.input_file,
+                batch_size=args.batch_size
+            )
+            
+            # Save detailed results
+            results_df.to_parquet(output_file, index=False)
         logger.info(f"Detailed results saved to: {output_file}")
         
         # Generate and save summary
@@ -201,17 +400,16 @@ def main():
         score_summary.to_csv(score_file)
         logger.info(f"Score summary saved to: {score_file}")
         
-        # Print basic statistics
+        # Print basic statistics — reuse the summary frames instead of
+        # re-scanning the full columns for the same numbers
         logger.info("\n=== Sentiment Analysis Results ===")
         logger.info(f"Total texts analyzed: {len(results_df)}")
         logger.info(f"Sentiment distribution:")
-        sentiment_counts = results_df["sentiment_normalized"].value_counts()
-        for sentiment, count in sentiment_counts.items():
-            percentage = (count / len(results_df) * 100)
-            logger.info(f"  {sentiment}: {count} ({percentage:.1f}%)")
+        for sentiment, row in sentiment_summary.iterrows():
+            logger.info(f"  {sentiment}: {row['count']} ({row['percentage']:.1f}%)")
         
-        logger.info(f"\nAverage sentiment score: {results_df['sentiment_score'].mean():.3f}")
-        logger.info(f"Sentiment score std: {results_df['sentiment_score'].std():.3f}")
+        logger.info(f"\nAverage sentiment score: {score_summary.loc['mean', 'sentiment_score']:.3f}")
+        logger.info(f"Sentiment score std: {score_summary.loc['std', 'sentiment_score']:.3f}")
         
     except Exception as e:
         logger.error(f"Error during sentiment analysis: {e}")
@@ -76,43 +76,8 @@ class TextMetricsAnalyzer(BaseAnalyzer):
         if not text or not text.strip():
             return self._get_empty_metrics()
         
-        metrics = {}
-        
         try:
-            # UDPipe-based analysis (if enabled)
-            if self.udpipe_enabled:
-                # Get UDPipe output if not provided
-                if udpipe_output is None:
-                    udpipe_output = self.udpipe_client.generate_one_response(text)
-                
-                # Parse UDPipe output
-                sentences = self.udpipe_client.parse_response(udpipe_output)
-                
-                # Linguistic complexity metrics from UDPipe
-                complexity_metrics = self.linguistic_complexity.analyze(sentences)
-                metrics.update(complexity_metrics)
-                
-                # Lemmatization from UDPipe
-                if include_lemmatization:
-                    lemma_metrics = self.lemmatizer.analyze(text, udpipe_output)
-                    metrics.update(lemma_metrics)
-                else:
-                    metrics["lemmas"] = ""
-            else:
-                # Fallback when UDPipe not available
-                metrics["lemmas"] = ""
-                # Set default values for UDPipe metrics
-                metrics.update({
-                    "MLC": 0.0,
-                    "MLS": 0.0,
-                    "DCC": 0.0,
-                    "CPC": 0.0,
-                    "profundidade_media": 0.0,
-                    "profundidade_max": 0,
-                    "ttr": 0.0,
-                    "lexical_density": 0.0,
-                    "token_quantity": 0,
-                })
+            metrics = self._udpipe_metrics(text, udpipe_output, include_lemmatization)
             
             # Stylometric analysis (always available)
             stylometric_metrics = self.stylometric.analyze(text)
@@ -130,6 +95,99 @@ class TextMetricsAnalyzer(BaseAnalyzer):
         except Exception as e:
             logger.error(f"Error during comprehensive text analysis: {e}")
             return self._get_empty_metrics()
+    
+    def analyze_many(
+        self,
+        texts,
+        udpipe_outputs=None,
+        include_ner: bool = True,
+        include_lemmatization: bool = True,
+        batch_size: int = 64,
+        n_process: int = 1
+    ):
+        """
+        Analyze a batch of texts sharing one spaCy pipe pass.
+        
+        Args:
+            texts: List of raw texts to analyze
+            udpipe_outputs: Optional list of pre-parsed UDPipe CoNLL-U outputs
+                (zipped positionally with texts)
+            include_ner: Whether to extract named entities
+            include_lemmatization: Whether to extract lemmas
+            batch_size: spaCy pipe batch size
+            n_process: Worker processes for the spaCy parse
+            
+        Returns:
+            List with one metrics dictionary per text
+        """
+        texts = list(texts)
+        if udpipe_outputs is None:
+            udpipe_outputs = [None] * len(texts)
+        
+        # One batched stylometric pass instead of a parse per text
+        stylometric_list = self.stylometric.analyze_batch(
+            texts, batch_size=batch_size, n_process=n_process
+        )
+        
+        results = []
+        for text, udpipe_output, stylometric_metrics in zip(texts, udpipe_outputs, stylometric_list):
+            if not text or not str(text).strip():
+                results.append(self._get_empty_metrics())
+                continue
+            try:
+                metrics = self._udpipe_metrics(str(text), udpipe_output, include_lemmatization)
+                if not include_ner:
+                    stylometric_metrics["per_count"] = 0
+                    stylometric_metrics["org_count"] = 0
+                    stylometric_metrics["loc_count"] = 0
+                metrics.update(stylometric_metrics)
+                results.append(metrics)
+            except Exception as e:
+                logger.error(f"Error during comprehensive text analysis: {e}")
+                results.append(self._get_empty_metrics())
+        return results
+    
+    def _udpipe_metrics(self, text: str, udpipe_output: Optional[str], include_lemmatization: bool) -> Dict:
+        """UDPipe-based metric block shared by analyze and analyze_many."""
+        metrics = {}
+        
+        # UDPipe-based analysis (if enabled)
+        if self.udpipe_enabled:
+            if udpipe_output is None:
+                # Cached request+parse keyed by the text itself
+                sentences = self.udpipe_client.parsed(text)
+            else:
+                # Parse the provided UDPipe output
+                sentences = self.udpipe_client.parse_response(udpipe_output)
+            
+            # Linguistic complexity metrics from UDPipe
+            complexity_metrics = self.linguistic_complexity.analyze(sentences)
+            metrics.update(complexity_metrics)
+            
+            # Lemmatization from UDPipe (reuse the sentences parsed above —
+            # passing the raw string would re-run conllu.parse on it)
+            if include_lemmatization:
+                lemma_metrics = self.lemmatizer.analyze_parsed(sentences)
+                metrics.update(lemma_metrics)
+            else:
+                metrics["lemmas"] = ""
+        else:
+            # Fallback when UDPipe not available
+            metrics["lemmas"] = ""
+            # Set default values for UDPipe metrics
+            metrics.update({
+                "MLC": 0.0,
+                "MLS": 0.0,
+                "DCC": 0.0,
+                "CPC": 0.0,
+                "profundidade_media": 0.0,
+                "profundidade_max": 0,
+                "ttr": 0.0,
+                "lexical_density": 0.0,
+                "token_quantity": 0,
+            })
+        
+        return metrics
 
 
 __all__ = [
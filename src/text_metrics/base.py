@@ -7,8 +7,78 @@ from typing import Dict, Optional
 import numpy as np
 import re
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 logger = logging.getLogger(__name__)
 
+# Tables for the syllable counter, built once at import and shared by every
+# call (re.sub with an inline pattern re-dispatched per word before this):
+# precompiled letter filter, vowel
+# codepoints, and diphthong pairs packed as (first<<16)|second so the
+# Python path detects them inline in a single pass
+_NON_PT_LETTER = re.compile(r'[^a-záéíóúàèìòùâêîôûãõ]')
+_VOWEL_ORDS = frozenset(map(ord, "aeiouáéíóúàèìòùâêîôûãõ"))
+_DIPH_PAIRS = frozenset((ord(d[0]) << 16) | ord(d[1]) for d in ("ai", "au", "ei", "eu", "oi", "ou", "ui"))
+
+# Codepoint arrays for the optional JIT kernel
+_VOWEL_CODES = np.array(sorted(_VOWEL_ORDS), dtype=np.uint32)
+_EXTRA_LETTER_CODES = np.array([ord(c) for c in "áéíóúàèìòùâêîôûãõ"], dtype=np.uint32)
+_DIPH_FIRST = np.array([ord(d[0]) for d in ("ai", "au", "ei", "eu", "oi", "ou", "ui")], dtype=np.uint32)
+_DIPH_SECOND = np.array([ord(d[1]) for d in ("ai", "au", "ei", "eu", "oi", "ou", "ui")], dtype=np.uint32)
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _syllables_nb(codes, vowels, extra_letters, diph_first, diph_second):
+        """Native single pass over lowercased codepoints: filter to letters,
+        count vowel-group starts, subtract diphthong pairs."""
+        letters = np.empty(codes.size, dtype=np.uint32)
+        n = 0
+        for i in range(codes.size):
+            c = codes[i]
+            keep = 97 <= c <= 122
+            if not keep:
+                for j in range(extra_letters.size):
+                    if c == extra_letters[j]:
+                        keep = True
+                        break
+            if keep:
+                letters[n] = c
+                n += 1
+        if n == 0:
+            return 1
+
+        count = 0
+        prev_vowel = False
+        for i in range(n):
+            c = letters[i]
+            is_vowel = False
+            for j in range(vowels.size):
+                if c == vowels[j]:
+                    is_vowel = True
+                    break
+            if is_vowel and not prev_vowel:
+                count += 1
+            prev_vowel = is_vowel
+
+        for i in range(n - 1):
+            for j in range(diph_first.size):
+                if letters[i] == diph_first[j] and letters[i + 1] == diph_second[j]:
+                    count -= 1
+                    break
+
+        return count if count > 1 else 1
+
+    # Prewarm so the first real document doesn't pay the compile
+    _syllables_nb(
+        np.frombuffer("aquecimento".encode("utf-32-le"), dtype=np.uint32),
+        _VOWEL_CODES, _EXTRA_LETTER_CODES, _DIPH_FIRST, _DIPH_SECOND,
+    )
+else:
+    _syllables_nb = None
+
 
 class BaseAnalyzer:
     """Base class for all text analyzers."""
@@ -28,25 +98,32 @@ class BaseAnalyzer:
         if not word:
             return 0
         
-        vowels = "aeiouáéíóúàèìòùâêîôûãõ"
-        word = re.sub(r'[^a-záéíóúàèìòùâêîôûãõ]', '', word)
+        if _syllables_nb is not None:
+            codes = np.frombuffer(word.encode("utf-32-le"), dtype=np.uint32)
+            return int(_syllables_nb(
+                codes, _VOWEL_CODES, _EXTRA_LETTER_CODES, _DIPH_FIRST, _DIPH_SECOND
+            ))
+        
+        word = _NON_PT_LETTER.sub('', word)
         
         if not word:
             return 1
         
+        # Single pass: count vowel-group starts and subtract diphthong
+        # pairs inline instead of seven str.count rescans
         syllable_count = 0
         previous_was_vowel = False
+        prev_ord = 0
         
         for char in word:
-            is_vowel = char in vowels
+            cur_ord = ord(char)
+            is_vowel = cur_ord in _VOWEL_ORDS
             if is_vowel and not previous_was_vowel:
                 syllable_count += 1
+            if ((prev_ord << 16) | cur_ord) in _DIPH_PAIRS:
+                syllable_count -= 1
             previous_was_vowel = is_vowel
-        
-        # Handle common diphthongs
-        diphthongs = ['ai', 'au', 'ei', 'eu', 'oi', 'ou', 'ui']
-        for diphthong in diphthongs:
-            syllable_count -= word.count(diphthong)
+            prev_ord = cur_ord
         
         return max(1, syllable_count)
     
@@ -39,11 +39,28 @@ class LemmatizerAnalyzer(BaseAnalyzer):
             # Parse the UDPipe output
             sentences = self.udpipe_client.parse_response(udpipe_output)
             
-            # Extract lemmas
-            lemmas = extract_lemmas_string(sentences)
+            return self.analyze_parsed(sentences)
             
-            return {"lemmas": lemmas}
+        except Exception as e:
+            logger.error(f"Error during lemmatization: {e}")
+            return {"lemmas": ""}
+    
+    def analyze_parsed(self, sentences) -> Dict:
+        """
+        Extract lemmas from already-parsed UDPipe sentences.
+        
+        Callers that parsed the CoNLL-U themselves (e.g. the orchestrating
+        TextMetricsAnalyzer) should use this to avoid a second conllu.parse
+        over the same output.
+        
+        Args:
+            sentences: List of parsed sentences from UDPipe
             
+        Returns:
+            Dictionary with lemmas field
+        """
+        try:
+            return {"lemmas": extract_lemmas_string(sentences)}
         except Exception as e:
             logger.error(f"Error during lemmatization: {e}")
             return {"lemmas": ""}
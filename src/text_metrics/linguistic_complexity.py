@@ -4,13 +4,28 @@ Based on LinguisticComplexityAnalyzer methodology.
 """
 
 import logging
-import numpy as np
 from typing import Dict, Optional
-from collections import Counter
 from .base import BaseAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# Dependency relations are matched on their base label (before any ":"
+# subtype, e.g. "acl:relcl" -> "acl") against these sets
+_CLAUSE_DEPRELS = frozenset({"csubj", "ccomp", "xcomp", "advcl", "acl"})
+_DEPENDENT_CLAUSE_DEPRELS = frozenset({"advcl", "acl"})
+_COORDINATION_DEPRELS = frozenset({"conj", "cc"})
+_LEXICAL_UPOS = frozenset({"NOUN", "ADJ", "VERB"})
+
+
+def _deprel_head(deprel):
+    """Base deprel label: "acl:relcl" -> "acl", plain labels unchanged.
+
+    find+slice avoids the throwaway list that split(":") allocates, and
+    the common no-subtype case returns the original string untouched.
+    """
+    i = deprel.find(":")
+    return deprel if i < 0 else deprel[:i]
+
 
 class LinguisticComplexityAnalyzer(BaseAnalyzer):
     """Analyzes linguistic complexity using UDPipe-parsed dependency structures."""
@@ -38,53 +53,42 @@ class LinguisticComplexityAnalyzer(BaseAnalyzer):
         """Internal method to analyze sentences."""
         metrics = {}
         
-        # Define helper functions
-        def is_clause(token):
-            for deprel in ["csubj", "ccomp", "xcomp", "advcl", "acl"]:
-                if deprel in token["deprel"]:
-                    return True
-            return False
-        
-        def is_dependent_clause(token):
-            for deprel in ["advcl", "acl"]:
-                if deprel in token["deprel"]:
-                    return True
-            return False
-        
-        def is_coordination(token):
-            for deprel in ["conj", "cc"]:
-                if deprel in token["deprel"]:
-                    return True
-            return False
+        # One pass over every token updates all counters at once instead of
+        # six separate comprehension sweeps with per-call deprel loops.
+        # TTR feeds the types set directly here — no intermediate token list
+        total_clauses = 0
+        total_dependent_clauses = 0
+        total_coordinated = 0
+        total_tokens = 0
+        lexical_count = 0
+        types = set()
         
-        def is_lexical(token):
-            return token["upos"] in ["NOUN", "ADJ", "VERB"]
+        for sent in sentences:
+            for token in sent:
+                deprel = token["deprel"]
+                base = _deprel_head(deprel)
+                if base in _CLAUSE_DEPRELS:
+                    total_clauses += 1
+                    if base in _DEPENDENT_CLAUSE_DEPRELS:
+                        total_dependent_clauses += 1
+                elif base in _COORDINATION_DEPRELS:
+                    total_coordinated += 1
+                if deprel == "punct":
+                    continue
+                total_tokens += 1
+                types.add(token["form"])
+                if token["upos"] in _LEXICAL_UPOS:
+                    lexical_count += 1
         
-        def profundidade_maxima(no):
-            if not no.children:
-                return 0
-            filho_mais_fundo = max([profundidade_maxima(child) for child in no.children])
-            return 1 + filho_mais_fundo
-        
-        # Count clauses and coordinations
-        total_clauses = sum(len([t for t in sent if is_clause(t)]) for sent in sentences)
-        total_dependent_clauses = sum(len([t for t in sent if is_dependent_clause(t)]) for sent in sentences)
-        total_coordinated = sum(len([t for t in sent if is_coordination(t)]) for sent in sentences)
-        
-        # Count tokens (exclude punctuation)
-        total_tokens = sum(len([t for t in sent if t["deprel"] != "punct"]) for sent in sentences)
         total_sentences = len(sentences)
         
         # Tree depths
-        depths = [profundidade_maxima(sent.to_tree()) for sent in sentences]
+        depths = [self._max_depth(sent) for sent in sentences]
         
         # TTR (Type-Token Ratio)
-        tokens = [t["form"] for sent in sentences for t in sent if t["deprel"] != "punct"]
-        types = set(tokens)
-        ttr = len(types) / len(tokens) if tokens else 0.0
+        ttr = len(types) / total_tokens if total_tokens else 0.0
         
         # Lexical density
-        lexical_count = sum(len([t for t in sent if is_lexical(t)]) for sent in sentences)
         lexical_density = lexical_count / total_tokens if total_tokens > 0 else 0.0
         
         # Complexity metrics
@@ -92,7 +96,9 @@ class LinguisticComplexityAnalyzer(BaseAnalyzer):
         metrics["MLS"] = round(total_tokens / total_sentences if total_sentences > 0 else 0, 2)
         metrics["DCC"] = round(total_dependent_clauses / total_clauses if total_clauses > 0 else 0, 2)
         metrics["CPC"] = round(total_coordinated / total_clauses if total_clauses > 0 else 0, 2)
-        metrics["profundidade_media"] = round(np.mean(depths), 2) if depths else 0.0
+        # Inline mean: depths is a handful of ints per doc, and np.mean
+        # would allocate an ndarray just to sum it
+        metrics["profundidade_media"] = round(sum(depths) / len(depths), 2) if depths else 0.0
         metrics["profundidade_max"] = int(max(depths)) if depths else 0
         metrics["ttr"] = round(ttr, 4)
         metrics["lexical_density"] = round(lexical_density, 4)
@@ -100,6 +106,32 @@ class LinguisticComplexityAnalyzer(BaseAnalyzer):
         
         return metrics
     
+    @staticmethod
+    def _max_depth(sent):
+        """Maximum dependency-tree depth straight from the head/id fields.
+
+        Equivalent to recursing over sent.to_tree() but without building
+        the tree or paying a Python stack frame per node: a BFS over a
+        children index touches every token once.
+        """
+        children_of = {}
+        for token in sent:
+            token_id = token["id"]
+            if not isinstance(token_id, int):
+                continue  # skip multiword-token ranges and empty nodes
+            children_of.setdefault(token["head"], []).append(token_id)
+        
+        # head 0 is the synthetic root; its child is the sentence root token
+        depth = -1
+        frontier = children_of.get(0, [])
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                next_frontier.extend(children_of.get(node, []))
+            frontier = next_frontier
+        return max(depth, 0)
+    
     def _get_base_metrics(self) -> Dict:
         """Return base metrics dictionary."""
         return {
@@ -4,39 +4,64 @@ Provides Flesch Reading Ease, POS frequencies, NER, and lexical metrics.
 """
 
 import logging
+import functools
 import spacy
+from spacy.attrs import POS, IS_PUNCT, IS_SPACE, LENGTH
+from spacy.symbols import NOUN, VERB, ADJ, ADV
 import numpy as np
 from typing import Dict, Optional
-from collections import Counter
 from .base import BaseAnalyzer
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=4)
+def _get_nlp(model_name, exclude):
+    """Load a spaCy model once per (model, exclude) combination.
+
+    Analyzer instances constructed in loops would otherwise re-pay the
+    model load each time; every analyzer with the same configuration now
+    shares one Language object.
+    """
+    return spacy.load(model_name, exclude=list(exclude))
+
+
 class StylometricAnalyzer(BaseAnalyzer):
     """
     Comprehensive stylometric analyzer for Portuguese text.
     Uses spaCy for POS tagging, NER, and lexical analysis.
     """
     
-    def __init__(self, model_name: str = "pt_core_news_sm"):
+    def __init__(self, model_name: str = "pt_core_news_sm", enable_ner: bool = True):
         """
         Initialize the stylometric analyzer.
         
         Args:
             model_name: spaCy Portuguese model name
+            enable_ner: Whether to keep the NER component loaded (callers
+                that never read entity counts can drop it entirely)
         """
+        # The analyzer reads POS tags, doc.sents and doc.ents only, so the
+        # lemmatizer is dead weight. The morphologizer must stay (it
+        # produces token.pos_ in the Portuguese models) and so must the
+        # parser (doc.sents).
+        exclude = ("lemmatizer", "ner") if not enable_ner else ("lemmatizer",)
         try:
-            self.nlp = spacy.load(model_name)
+            self.nlp = _get_nlp(model_name, exclude)
             logger.info(f"Loaded spaCy model: {model_name}")
         except IOError:
             logger.warning(f"Model {model_name} not found. Trying pt_core_news_sm...")
             try:
-                self.nlp = spacy.load("pt_core_news_sm")
+                self.nlp = _get_nlp("pt_core_news_sm", exclude)
                 logger.info("Loaded spaCy model: pt_core_news_sm")
             except IOError:
                 logger.error("No Portuguese spaCy model found. Install with: python -m spacy download pt_core_news_sm")
                 raise
+        
+        # Metrics memo per text: templated corpora repeat responses
+        # verbatim, and reparsing them is pure waste. FIFO-bounded.
+        self._metrics_cache = {}
+        self._metrics_cache_max = 8192
     
     def analyze(self, text: str) -> Dict:
         """
@@ -51,37 +76,86 @@ class StylometricAnalyzer(BaseAnalyzer):
         if not text or not text.strip():
             return self._get_stylometric_metrics()
         
+        cached = self._metrics_cache.get(text)
+        if cached is not None:
+            # Copy so callers that zero out fields don't corrupt the cache
+            return dict(cached)
+        
         try:
-            doc = self.nlp(text)
-            metrics = {}
-            
-            # POS frequencies
-            metrics.update(self._calculate_pos_frequencies(doc))
-            
-            # Named entities
-            metrics.update(self._extract_named_entities(doc))
-            
-            # Lexical metrics
-            metrics.update(self._calculate_lexical_metrics(doc))
-            
-            # Flesch Reading Ease
-            metrics["flesch_reading_ease"] = self._calculate_flesch_reading_ease(text, doc)
-            
-            # Syntactic metrics
-            metrics.update(self._calculate_syntactic_metrics(doc))
-            
-            return metrics
+            metrics = self._metrics_from_doc(text, self.nlp(text))
             
         except Exception as e:
             logger.error(f"Error in comprehensive stylometric analysis: {e}")
             return self._get_stylometric_metrics()
+        
+        if len(self._metrics_cache) >= self._metrics_cache_max:
+            self._metrics_cache.pop(next(iter(self._metrics_cache)))
+        self._metrics_cache[text] = metrics
+        return dict(metrics)
     
-    def _calculate_pos_frequencies(self, doc) -> Dict:
-        """Calculate POS tag frequencies."""
+    def analyze_batch(self, texts, batch_size: int = 64, n_process: int = 1):
+        """
+        Analyze many texts with a single nlp.pipe pass.
+        
+        Feeding documents one by one serializes spaCy's pipeline per text;
+        pipe amortizes the Cython dispatch over the whole batch and can
+        parallelize across processes.
+        
+        Args:
+            texts: Iterable of input texts
+            batch_size: spaCy pipe batch size
+            n_process: Worker processes for the parse
+            
+        Returns:
+            List with one metrics dictionary per input text
+        """
+        texts = ["" if text is None else str(text) for text in texts]
+        results = []
+        docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+        for text, doc in zip(texts, docs):
+            if not text.strip():
+                results.append(self._get_stylometric_metrics())
+                continue
+            try:
+                results.append(self._metrics_from_doc(text, doc))
+            except Exception as e:
+                logger.error(f"Error in comprehensive stylometric analysis: {e}")
+                results.append(self._get_stylometric_metrics())
+        return results
+    
+    def _metrics_from_doc(self, text: str, doc) -> Dict:
+        """Compute every stylometric metric block from one parsed Doc.
+        
+        A single attribute export and word mask feed all blocks, so the
+        token stream is traversed once rather than once per metric family.
+        """
+        arr = doc.to_array([POS, IS_PUNCT, IS_SPACE, LENGTH])
+        word_mask = (arr[:, 1] == 0) & (arr[:, 2] == 0)
+        
         metrics = {}
         
-        tokens = [token for token in doc if not token.is_punct and not token.is_space]
-        total_tokens = len(tokens)
+        # POS frequencies
+        metrics.update(self._calculate_pos_frequencies(arr, word_mask))
+        
+        # Named entities
+        metrics.update(self._extract_named_entities(doc))
+        
+        # Lexical metrics
+        metrics.update(self._calculate_lexical_metrics(arr, word_mask))
+        
+        # Flesch Reading Ease
+        metrics["flesch_reading_ease"] = self._calculate_flesch_reading_ease(doc, word_mask)
+        
+        # Syntactic metrics
+        metrics.update(self._calculate_syntactic_metrics(doc, arr, word_mask))
+        
+        return metrics
+    
+    def _calculate_pos_frequencies(self, arr, word_mask) -> Dict:
+        """Calculate POS tag frequencies from the shared attribute export."""
+        metrics = {}
+        
+        total_tokens = int(word_mask.sum())
         
         if total_tokens == 0:
             return {
@@ -91,12 +165,12 @@ class StylometricAnalyzer(BaseAnalyzer):
                 "adv_freq": 0.0
             }
         
-        pos_counts = Counter(token.pos_ for token in tokens)
+        pos = arr[word_mask, 0]
         
-        metrics["noun_freq"] = round((pos_counts.get('NOUN', 0) / total_tokens) * 100, 2)
-        metrics["verb_freq"] = round((pos_counts.get('VERB', 0) / total_tokens) * 100, 2)
-        metrics["adj_freq"] = round((pos_counts.get('ADJ', 0) / total_tokens) * 100, 2)
-        metrics["adv_freq"] = round((pos_counts.get('ADV', 0) / total_tokens) * 100, 2)
+        metrics["noun_freq"] = round(float((pos == NOUN).sum()) / total_tokens * 100, 2)
+        metrics["verb_freq"] = round(float((pos == VERB).sum()) / total_tokens * 100, 2)
+        metrics["adj_freq"] = round(float((pos == ADJ).sum()) / total_tokens * 100, 2)
+        metrics["adv_freq"] = round(float((pos == ADV).sum()) / total_tokens * 100, 2)
         
         return metrics
     
@@ -114,55 +188,51 @@ class StylometricAnalyzer(BaseAnalyzer):
         
         return entity_counts
     
-    def _calculate_lexical_metrics(self, doc) -> Dict:
-        """Calculate lexical metrics."""
+    def _calculate_lexical_metrics(self, arr, word_mask) -> Dict:
+        """Calculate lexical metrics from the shared attribute export."""
         metrics = {}
         
-        tokens = [token for token in doc if not token.is_punct and not token.is_space]
-        total_tokens = len(tokens)
+        word_lengths = arr[word_mask, 3]
         
-        if total_tokens == 0:
+        if word_lengths.size == 0:
             return {
                 "avg_word_length": 0.0,
                 "long_words_ratio": 0.0
             }
         
-        word_lengths = [len(token.text) for token in tokens]
-        metrics["avg_word_length"] = round(np.mean(word_lengths), 2)
-        
-        long_words = [t for t in tokens if len(t.text) > 6]
-        metrics["long_words_ratio"] = round((len(long_words) / total_tokens) * 100, 2)
+        metrics["avg_word_length"] = round(float(word_lengths.mean()), 2)
+        metrics["long_words_ratio"] = round(float((word_lengths > 6).mean()) * 100, 2)
         
         return metrics
     
-    def _calculate_flesch_reading_ease(self, text: str, doc) -> float:
+    def _calculate_flesch_reading_ease(self, doc, word_mask) -> float:
         """
         Calculate Flesch Reading Ease score for Portuguese.
-        
+
         Formula: FRE = 248.835 - 1.015 * (words/sentences) - 84.6 * (syllables/words)
-        
+
         Args:
-            text: Original text
             doc: Parsed spaCy Doc object
-            
+            word_mask: Shared non-punct/non-space token mask
+
         Returns:
             Flesch Reading Ease score
         """
         try:
-            sentences = list(doc.sents)
-            total_sentences = len(sentences)
-            
+            total_sentences = sum(1 for _ in doc.sents)
+
             if total_sentences == 0:
                 return 0.0
-            
-            words = [token for token in doc if not token.is_punct and not token.is_space]
-            total_words = len(words)
-            
+
+            word_indices = np.flatnonzero(word_mask)
+            total_words = int(word_indices.size)
+
             if total_words == 0:
                 return 0.0
-            
-            # Estimate syllables for Portuguese
-            total_syllables = sum(self._count_syllables_pt(token.text) for token in words)
+
+            # Estimate syllables for Portuguese; only the word tokens are
+            # touched, via the shared mask
+            total_syllables = sum(self._count_syllables_pt(doc[int(i)].text) for i in word_indices)
             
             avg_sentence_length = total_words / total_sentences
             avg_syllables_per_word = total_syllables / total_words
@@ -176,23 +246,18 @@ class StylometricAnalyzer(BaseAnalyzer):
             logger.warning(f"Error calculating Flesch score: {e}")
             return 0.0
     
-    def _calculate_syntactic_metrics(self, doc) -> Dict:
-        """Calculate syntactic metrics."""
+    def _calculate_syntactic_metrics(self, doc, arr, word_mask) -> Dict:
+        """Calculate syntactic metrics from the shared attribute export."""
         metrics = {}
         
-        sentences = list(doc.sents)
-        
-        # Sentence length variance
-        sentence_lengths = []
-        for sent in sentences:
-            sent_words = [token for token in sent if not token.is_punct and not token.is_space]
-            sentence_lengths.append(len(sent_words))
+        # Sentence length variance (word counts come from slicing the mask)
+        sentence_lengths = [int(word_mask[sent.start:sent.end].sum()) for sent in doc.sents]
         
         metrics["sentence_length_variance"] = round(np.var(sentence_lengths), 2) if len(sentence_lengths) > 1 else 0.0
         
         # Punctuation ratio
-        total_tokens = len([t for t in doc if not t.is_space])
-        punct_count = len([t for t in doc if t.is_punct])
+        total_tokens = int((arr[:, 2] == 0).sum())
+        punct_count = int(arr[:, 1].sum())
         metrics["punctuation_ratio"] = round((punct_count / total_tokens) * 100, 2) if total_tokens > 0 else 0.0
         
         return metrics
@@ -2,9 +2,15 @@
 Unified UDPipe client with retry logic and error handling.
 """
 
+import os
+import collections
 import requests
+from requests.adapters import HTTPAdapter
+import asyncio
+import hashlib
 import time
 import logging
+from pathlib import Path
 from typing import Optional, List
 
 try:
@@ -13,25 +19,74 @@ except ImportError:
     print("Warning: conllu not installed. Install with: pip install conllu")
     parse = None
 
+try:
+    import aiohttp
+except ImportError:
+    print("Warning: aiohttp not installed. Install with: pip install aiohttp")
+    aiohttp = None
+
+try:
+    from ufal.udpipe import Model, Pipeline
+except ImportError:
+    Model = None
+    Pipeline = None
+
 logger = logging.getLogger(__name__)
 
+# Loaded local models, shared per path — Model.load parses the whole model
+# file in C++ and should happen once per process
+_local_pipelines = {}
+
+
+def _get_local_pipeline(path):
+    pipeline = _local_pipelines.get(path)
+    if pipeline is None:
+        if Model is None:
+            raise ImportError("ufal.udpipe package not available")
+        model = Model.load(path)
+        if not model:
+            raise ValueError(f"Failed to load UDPipe model from {path}")
+        pipeline = Pipeline(model, "tokenize", Pipeline.DEFAULT, Pipeline.DEFAULT, "conllu")
+        _local_pipelines[path] = pipeline
+    return pipeline
+
+
 URL = 'http://lindat.mff.cuni.cz/services/udpipe/api/process'
 
 
 class UDPipeClient:
     """Shared UDPipe client with retry logic and error handling."""
     
-    def __init__(self, model="portuguese-bosque-ud-2.12-230717", max_retries=3, retry_delay=5):
+    def __init__(self, model="portuguese-bosque-ud-2.12-230717", max_retries=3, retry_delay=5,
+                 local_model_path=None, enable_cache=False):
         self.url = URL
         self.model = model
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        # With a local model file the parse runs in-process through the
+        # ufal.udpipe C++ bindings — no network round trip per text
+        self._pipeline = _get_local_pipeline(local_model_path) if local_model_path else None
+        # Content-addressed disk cache: re-runs over the same corpus (and
+        # duplicated texts within it) collapse to a file read
+        self._cache_dir = None
+        if enable_cache:
+            self._cache_dir = Path(os.getenv("UDPIPE_CACHE", "~/.cache/udpipe")).expanduser()
+        # LRU of parsed sentences so repeat texts skip both the request and
+        # the conllu parse
+        self._parsed_cache = collections.OrderedDict()
+        self._parsed_cache_max = 1024
         self.data_metadata = {
             'tokenizer': '',
             'tagger': '',
             'parser': '',
             'model': model,
         }
+        # Pooled keep-alive session: one TCP+TLS handshake reused across
+        # calls instead of a fresh connection per request
+        self.session = requests.Session()
+        self.session.mount(self.url, HTTPAdapter(
+            pool_connections=16, pool_maxsize=32, max_retries=0
+        ))
     
     def generate_one_response(self, message: str) -> str:
         """
@@ -46,11 +101,21 @@ class UDPipeClient:
         Raises:
             Exception: If all retries fail
         """
+        cache_path = self._cache_path(message)
+        if cache_path is not None and cache_path.exists():
+            return cache_path.read_text()
+        
+        if self._pipeline is not None:
+            result = self._pipeline.process(message)
+            if cache_path is not None:
+                self._cache_store(cache_path, result)
+            return result
+        
         for attempt in range(self.max_retries):
             try:
                 request_param = self.data_metadata.copy()
                 request_param["data"] = message
-                response = requests.post(self.url, data=request_param, timeout=30)
+                response = self.session.post(self.url, data=request_param, timeout=30)
                 
                 # Check if the response is valid
                 if response.status_code != 200:
@@ -62,6 +127,8 @@ class UDPipeClient:
                     raise Exception(f"No result in response: {response_json}")
                 
                 udpipe_output = response_json["result"]
+                if cache_path is not None:
+                    self._cache_store(cache_path, udpipe_output)
                 return udpipe_output
                 
             except requests.exceptions.Timeout:
@@ -90,6 +157,100 @@ class UDPipeClient:
         
         raise Exception("All retry attempts failed")
     
+    def _cache_path(self, message: str):
+        """Cache file for a text, sharded on the first two hash chars."""
+        if self._cache_dir is None:
+            return None
+        key = hashlib.sha1(message.encode("utf-8")).hexdigest()
+        return self._cache_dir / key[:2] / key
+    
+    @staticmethod
+    def _cache_store(cache_path, result: str):
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(result)
+        except OSError as e:
+            logger.warning(f"Failed to write UDPipe cache entry: {e}")
+    
+    async def generate_many(self, messages, concurrency: int = 8):
+        """
+        Generate UDPipe responses for many texts with bounded concurrency.
+        
+        The synchronous generate_one_response serializes every call on the
+        round trip to the UDPipe server; fanning requests out with aiohttp
+        under a semaphore cuts wall time by roughly the concurrency factor
+        (up to whatever the server tolerates).
+        
+        Args:
+            messages: Iterable of texts to parse
+            concurrency: Maximum number of requests in flight
+            
+        Returns:
+            List of UDPipe outputs in CoNLL-U format, one per message
+            
+        Raises:
+            Exception: If any message still fails after all retries
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp package not available")
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def generate_one(session, message):
+            async with semaphore:
+                for attempt in range(self.max_retries):
+                    try:
+                        request_param = self.data_metadata.copy()
+                        request_param["data"] = message
+                        async with session.post(
+                            self.url, data=request_param,
+                            timeout=aiohttp.ClientTimeout(total=30)
+                        ) as response:
+                            if response.status != 200:
+                                raise Exception(f"HTTP Error: {response.status}, {await response.text()}")
+                            response_json = await response.json()
+                            if "result" not in response_json:
+                                raise Exception(f"No result in response: {response_json}")
+                            return response_json["result"]
+                    except Exception as e:
+                        logger.warning(f"Error on attempt {attempt + 1}/{self.max_retries}: {e}")
+                        if attempt < self.max_retries - 1:
+                            await asyncio.sleep(self.retry_delay)
+                        else:
+                            raise
+        
+        async with aiohttp.ClientSession() as session:
+            coroutines = [generate_one(session, message) for message in messages]
+            return await asyncio.gather(*coroutines)
+    
+    def generate_many_sync(self, messages, concurrency: int = 8):
+        """Synchronous wrapper around generate_many for non-async callers."""
+        return asyncio.run(self.generate_many(messages, concurrency=concurrency))
+    
+    def parsed(self, text: str):
+        """
+        Parsed UDPipe sentences for a text, cached per text.
+        
+        Consumers that work from raw strings re-parse identical CoNLL-U
+        output once per use; this keeps the parsed form in a small LRU so
+        duplicates pay neither the request nor the parse.
+        
+        Args:
+            text: Text to run through UDPipe
+            
+        Returns:
+            List of parsed sentences
+        """
+        sentences = self._parsed_cache.get(text)
+        if sentences is not None:
+            self._parsed_cache.move_to_end(text)
+            return sentences
+        sentences = self.parse_response(self.generate_one_response(text))
+        self._parsed_cache[text] = sentences
+        if len(self._parsed_cache) > self._parsed_cache_max:
+            self._parsed_cache.popitem(last=False)
+        return sentences
+    
     def parse_response(self, udpipe_output: str):
         """
         Parse UDPipe output into CoNLL-U format.
@@ -116,12 +277,11 @@ def extract_lemmas_string(sentences) -> str:
     Returns:
         str: Space-separated string of lemmas (excluding punctuation and nummod)
     """
-    lemmas = []
-    for sentence in sentences:
-        for token in sentence:
-            if token["deprel"] == "punct":
-                continue
-            if token["deprel"] == "nummod":
-                continue
-            lemmas.append(token["lemma"])
-    return " ".join(lemmas)
+    # Generator-fed join: no intermediate lemma list held next to the
+    # result string
+    return " ".join(
+        token["lemma"]
+        for sentence in sentences
+        for token in sentence
+        if token["deprel"] not in ("punct", "nummod")
+    )
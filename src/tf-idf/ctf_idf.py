@@ -5,11 +5,17 @@ Class-based TF-IDF analysis for text data grouped by specified column.
 
 import argparse
 import os
+import numpy as np
 import pandas as pd
 import nltk
 from sklearn.feature_extraction.text import CountVectorizer
 from bertopic.vectorizers import ClassTfidfTransformer
 
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
 
 def setup_nltk_stopwords():
     """Download and setup Portuguese stopwords from NLTK."""
@@ -24,7 +30,8 @@ def setup_nltk_stopwords():
     return portuguese_stopwords
 
 
-def perform_ctfidf_analysis(model_name, agg_column, data_file="../../data/merged_data.parquet"):
+def perform_ctfidf_analysis(model_name, agg_column, data_file="../../data/merged_data.parquet",
+                            top_k=200):
     """
     Perform Class-based TF-IDF analysis on text data.
     
@@ -32,6 +39,7 @@ def perform_ctfidf_analysis(model_name, agg_column, data_file="../../data/merged
         model_name (str): Name of the model to filter data by
         agg_column (str): Column name to group data by
         data_file (str): Path to the parquet data file
+        top_k (int): Number of top words kept per class
     
     Returns:
         pandas.DataFrame: DataFrame with top words and TF-IDF values per class
@@ -51,13 +59,24 @@ def perform_ctfidf_analysis(model_name, agg_column, data_file="../../data/merged
     
     # Group by specified column and aggregate responses
     print(f"Grouping data by '{agg_column}' column...")
-    # Filter out None values before joining
-    def safe_join(series):
-        # Filter out None values and convert to string, then join
-        valid_responses = series.dropna().astype(str)
-        return ' '.join(valid_responses) if len(valid_responses) > 0 else ''
-    
-    docs_per_class = model_data.groupby([agg_column], as_index=False).agg({'response_lemm': safe_join})
+    if pl is not None:
+        # polars concatenates each group in multithreaded Rust instead of a
+        # single-threaded Python ' '.join per group
+        docs_per_class = (
+            pl.from_pandas(model_data[[agg_column, 'response_lemm']])
+            .drop_nulls('response_lemm')
+            .group_by(agg_column)
+            .agg(pl.col('response_lemm').cast(pl.String).str.join(' '))
+            .to_pandas()
+        )
+    else:
+        # Filter out None values before joining
+        def safe_join(series):
+            # Filter out None values and convert to string, then join
+            valid_responses = series.dropna().astype(str)
+            return ' '.join(valid_responses) if len(valid_responses) > 0 else ''
+        
+        docs_per_class = model_data.groupby([agg_column], as_index=False).agg({'response_lemm': safe_join})
     
     # Filter out empty strings and ensure we have valid data
     docs_per_class = docs_per_class[docs_per_class['response_lemm'].str.len() > 0]
@@ -70,25 +89,35 @@ def perform_ctfidf_analysis(model_name, agg_column, data_file="../../data/merged
     # Setup Portuguese stopwords
     portuguese_stopwords = setup_nltk_stopwords()
     
-    # Vectorize text
+    # Vectorize text. The vocabulary is capped and counts use float32 —
+    # half the matrix bytes with no effect on the ranking
     print("Vectorizing text...")
-    count_vectorizer = CountVectorizer(stop_words=list(portuguese_stopwords)).fit(docs_per_class.response_lemm)
+    count_vectorizer = CountVectorizer(
+        stop_words=list(portuguese_stopwords),
+        max_features=100_000,
+        dtype=np.float32,
+    ).fit(docs_per_class.response_lemm)
     count = count_vectorizer.transform(docs_per_class.response_lemm)
     words = count_vectorizer.get_feature_names_out()
     
-    # Apply Class-based TF-IDF
+    # Apply Class-based TF-IDF; keep the matrix sparse — densifying the
+    # whole (classes x vocabulary) block is the peak-memory hot spot
     print("Applying Class-based TF-IDF transformation...")
-    ctfidf = ClassTfidfTransformer(reduce_frequent_words=True, bm25_weighting=True).fit_transform(count).toarray()
+    ctfidf = ClassTfidfTransformer(reduce_frequent_words=True, bm25_weighting=True).fit_transform(count)
     
     # Extract top words per class
     print("Extracting top words per class...")
     words_per_class = {}
     for label in range(len(docs_per_class[agg_column])):
-        # Get word indices in decreasing order of TF-IDF score
-        top_indices = ctfidf[label].argsort()[::-1]
+        row = ctfidf.getrow(label).toarray().ravel()
+        k = min(top_k, row.size)
+        # Partial selection of the k best indices (O(V)), then sort only
+        # those instead of argsorting the full vocabulary row
+        top_indices = np.argpartition(-row, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-row[top_indices])]
         # Create list of tuples (word, tfidf_value)
         words_per_class[docs_per_class[agg_column].iloc[label]] = [
-            (words[index], ctfidf[label][index])
+            (words[index], row[index])
             for index in top_indices
         ]
     
@@ -116,12 +145,15 @@ def main():
                        help='Path to the parquet data file (default: data/merged_data.parquet)')
     parser.add_argument('--output-dir', default='.', 
                        help='Output directory for CSV file (default: current directory)')
+    parser.add_argument('--top-k', type=int, default=200,
+                       help='Number of top words kept per class (default: 200)')
     
     args = parser.parse_args()
     
     try:
         # Perform analysis
-        result_df = perform_ctfidf_analysis(args.model_name, args.agg_column, args.data_file)
+        result_df = perform_ctfidf_analysis(args.model_name, args.agg_column, args.data_file,
+                                            top_k=args.top_k)
         
         # Generate output filename
         output_filename = f"ctfidf_{args.model_name.replace('.', '_')}_{args.agg_column}.csv"
@@ -0,0 +1,175 @@
+from src.prompting.renderedPromptRecord import RenderedPromptRecord
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
+from concurrent.futures import ThreadPoolExecutor
+from tqdm.auto import tqdm
+import hashlib
+import scipy.sparse
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import absl.flags
+import absl.app
+import os
+
+FLAGS = absl.flags.FLAGS
+
+
+def _valid_text(text):
+    """True for non-empty, non-whitespace strings.
+
+    isspace short-circuits on the first real character instead of
+    allocating a stripped copy per row.
+    """
+    return isinstance(text, str) and bool(text) and not text.isspace()
+
+
+# Definição das flags
+absl.flags.DEFINE_string("record_folder", None, "Path that contains the desired records")
+absl.flags.DEFINE_boolean("hashing", False, "Hash tokens instead of building a vocabulary (Word column omitted).")
+absl.flags.DEFINE_boolean("reuse_cache", False, "Reload the saved matrix when the corpus is unchanged.")
+absl.flags.mark_flag_as_required("record_folder")
+
+
+def main(_):
+    # Single implementation on purpose: keeping one copy of this pipeline
+    # means every optimization lands exactly once
+    record_folder = FLAGS.record_folder
+    with os.scandir(record_folder) as entries:
+        records_path = sorted(
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.endswith(".pickle")
+        )
+    # Threads, not processes: a process pool would pickle every loaded
+    # record right back across the IPC boundary, costing more than the
+    # load itself. The mmap-backed loads release the GIL in the IO layer.
+    with ThreadPoolExecutor(max_workers=min(16, max(1, len(records_path)))) as executor:
+        records = list(tqdm(
+            executor.map(RenderedPromptRecord.load_from_file_static, records_path),
+            total=len(records_path), desc="Loading records",
+        ))
+
+    for record in records:
+        record.generate_responseId()
+
+    def iter_responses():
+        """Yield (responseId, response) for every non-empty response."""
+        for record in records:
+            for row in record.response_iter():
+                response = row.get("response")
+                if _valid_text(response):
+                    yield str(row["responseId"]), response
+
+    # Fingerprint the corpus so reruns can tell whether the saved matrix
+    # is still valid
+    hasher = hashlib.sha1()
+    for responseId, response in iter_responses():
+        hasher.update(responseId.encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(response.encode("utf-8"))
+        hasher.update(b"\0")
+    corpus_hash = hasher.hexdigest()
+
+    matrix_path = os.path.join(record_folder, "tfidf.npz")
+    words_path = os.path.join(record_folder, "tfidf_words.npy")
+    ids_path = os.path.join(record_folder, "tfidf_ids.npy")
+    hash_path = os.path.join(record_folder, "tfidf.hash")
+
+    cache_valid = (
+        FLAGS.reuse_cache
+        and os.path.exists(matrix_path)
+        and os.path.exists(ids_path)
+        and os.path.exists(hash_path)
+        and open(hash_path).read().strip() == corpus_hash
+    )
+
+    if cache_valid:
+        # Downstream experiments reload in milliseconds instead of
+        # re-tokenizing the whole corpus
+        print("Reusing cached tf-idf matrix...")
+        result = scipy.sparse.load_npz(matrix_path)
+        words = np.load(words_path, allow_pickle=True) if os.path.exists(words_path) else None
+        corpus_ids = np.load(ids_path, allow_pickle=True).tolist()
+        _vectorize = False
+    else:
+        _vectorize = True
+
+    # Stream the texts straight into fit_transform — the vectorizer only
+    # needs one pass, so no materialized corpus list is kept around. The
+    # ids are collected as the stream is consumed to stay aligned.
+    if _vectorize:
+        corpus_ids = []
+
+        def texts():
+            for responseId, response in iter_responses():
+                corpus_ids.append(responseId)
+                yield response
+
+        print("Vectorizing responses...")
+        if FLAGS.hashing:
+            # Constant-memory path for runs that only need weights: no
+            # vocabulary dict is ever built and tokens are addressed purely
+            # by hash index, so the Word column is omitted from the output
+            pipe = make_pipeline(
+                HashingVectorizer(n_features=1 << 20, alternate_sign=False, norm=None, dtype=np.float32),
+                TfidfTransformer(sublinear_tf=True),
+            )
+            result = pipe.fit_transform(texts())
+            words = None
+        else:
+            # float32 halves the CSR and everything downstream of it;
+            # sublinear tf (1 + log tf) is the damped form the analyses want
+            # anyway, and min_df=2 drops hapax legomena, which dominate the
+            # nnz on LLM output
+            vectorizer = TfidfVectorizer(dtype=np.float32, sublinear_tf=True, norm='l2', min_df=2)
+            result = vectorizer.fit_transform(texts())
+            words = vectorizer.get_feature_names_out()
+        print(f"Vectorized {len(corpus_ids)} documents.")
+
+        # Persist the matrix and its companions so --reuse_cache runs can
+        # skip the vectorization entirely
+        scipy.sparse.save_npz(matrix_path, result)
+        if words is not None:
+            np.save(words_path, words)
+        np.save(ids_path, np.asarray(corpus_ids, dtype=object))
+        with open(hash_path, "w") as f:
+            f.write(corpus_hash)
+
+    # Build the triplet table straight from the COO arrays — one C-level
+    # gather per column instead of a Python loop over every nonzero —
+    # and hand it to Arrow directly: no pandas block manager in between,
+    # and the repeated ResponseId/Word strings dictionary-encode down to
+    # one copy each. Narrow dtypes: the indices fit int32.
+    coo = result.tocoo()
+    # Single C-level gathers — no per-nonzero scalar indexing anywhere
+    rid_col = np.asarray(corpus_ids, dtype=object)[coo.row]
+    columns = {
+        "ResponseId": pa.array(rid_col).dictionary_encode(),
+        "Document Index": pa.array(coo.row.astype(np.int32)),
+        "Word Index": pa.array(coo.col.astype(np.int32)),
+        "tf-idf value": pa.array(coo.data),
+    }
+    if words is not None:
+        columns["Word"] = pa.array(words[coo.col]).dictionary_encode()
+    table = pa.table(columns)
+
+    output_path = os.path.join(record_folder, "tfidf_results.parquet")
+    print(f"Saving tf-idf results to {output_path}")
+    pq.write_table(table, output_path, compression="zstd")
+    print(f"Saved {table.num_rows} nonzero entries.")
+
+    # The documents live in their own table keyed by Document Index;
+    # repeating the full response text once per nonzero token would blow
+    # the triplet parquet up by the tokens-per-document factor
+    documents_path = os.path.join(record_folder, "tfidf_documents.parquet")
+    pd.DataFrame({
+        "Document Index": np.arange(len(corpus_ids), dtype=np.int32),
+        "ResponseId": corpus_ids,
+        "Document": [response for _, response in iter_responses()],
+    }).to_parquet(documents_path, index=False)
+    print(f"Saved {len(corpus_ids)} documents to {documents_path}")
+
+
+if __name__ == '__main__':
+    absl.app.run(main)
@@ -9,6 +9,8 @@ import absl.flags
 import time
 import os
 from pathlib import Path
+from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -18,6 +20,7 @@ from src.text_metrics.linguistic_complexity import LinguisticComplexityAnalyzer
 from src.udpipe.udpipe_utils import UDPipeClient
 
 logging.getLogger().setLevel(logging.ERROR)
+logger = logging.getLogger("udpipe")
 
 FLAGS = absl.flags.FLAGS
 
@@ -27,104 +30,212 @@ absl.flags.mark_flag_as_required("record_path")
 
 URL = 'http://lindat.mff.cuni.cz/services/udpipe/api/process'
 
+
+def _valid_text(text):
+    """True for non-empty, non-whitespace strings (no strip allocation)."""
+    return isinstance(text, str) and bool(text) and not text.isspace()
+
+
 class UdpipeCaller():
     def __init__(self,
                  url,
                  stats_generator = None,
                  model="portuguese-bosque-ud-2.12-230717",
-                 save_interval=10):
+                 save_interval=10,
+                 concurrency=8):
         self.url = url
         self.model = model
         self.stats_generator = stats_generator
         self.save_interval = save_interval  # Save every N processed items
+        self.concurrency = concurrency  # Parallel requests in flight
         self.processed_count = 0
         self.failed_items = []  # Track failed items for retry
         self.udpipe_client = UDPipeClient(model=model)
         signal.signal(signal.SIGTERM, self.handle_sigint)
         signal.signal(signal.SIGINT, self.handle_sigint)
 
+    MAX_BATCH_ITEMS = 50
+    MAX_BATCH_CHARS = 100_000
+
     def generate_one_response(self, message, max_retries=3, retry_delay=5):
         """Generate response with retry logic and error handling."""
         return self.udpipe_client.generate_one_response(message)
+
+    def _make_batches(self, pending):
+        """Pack short messages into shared requests to amortize the RTT.
+
+        Only messages without blank lines can share a request (the blank
+        line is the document separator, so one inside a message would
+        desynchronize the split). Long or unsplittable items go alone.
+        """
+        batches = []
+        current = []
+        current_chars = 0
+        for item in pending:
+            message = item[2]
+            if "\n\n" in message or len(message) > self.MAX_BATCH_CHARS:
+                batches.append([item])
+                continue
+            if current and (len(current) >= self.MAX_BATCH_ITEMS
+                            or current_chars + len(message) > self.MAX_BATCH_CHARS):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(item)
+            current_chars += len(message)
+        if current:
+            batches.append(current)
+        return batches
+
+    def generate_batch_response(self, batch):
+        """One POST for a whole batch, split back on paragraph boundaries."""
+        if len(batch) == 1:
+            return [self.generate_one_response(batch[0][2])]
+
+        joined = "\n\n".join(item[2] for item in batch)
+        conllu = self.generate_one_response(joined)
+
+        # The tokenizer opens a "# newpar" paragraph per blank-line-separated
+        # message, so the markers realign the output with the batch
+        parts = ["# newpar" + part for part in conllu.split("# newpar")[1:]]
+        if len(parts) != len(batch):
+            # Segmentation didn't line up with the sends; redo individually
+            return [self.generate_one_response(item[2]) for item in batch]
+        return parts
         
+    def _record_failure(self, error_info):
+        """Track a failure in memory and append it to the JSONL log."""
+        self.failed_items.append(error_info)
+        if getattr(self, 'failed_fh', None) is not None:
+            self.failed_fh.write(json.dumps(error_info, default=str) + '\n')
+
     def save_failed_items(self):
-        """Save failed items to a separate file for later retry."""
-        if self.failed_items:
-            try:
-                failed_path = self.record.file_path.replace('.pickle', '_failed_items.json')
-                with open(failed_path, 'w') as f:
-                    json.dump(self.failed_items, f, indent=2)
-                print(f"Failed items saved to: {failed_path}")
-            except Exception as e:
-                print(f"Failed to save failed items: {e}")
+        """Report the failed-items log (it is written incrementally)."""
+        if self.failed_items and getattr(self, 'failed_path', None):
+            print(f"Failed items logged to: {self.failed_path}")
         
     def feed_into_udpipe(self, record, generate_stats=True):
         self.record = record
         self.record.generate_responseId()
+        
+        # Append-only shard: rewriting the whole pickle every save_interval
+        # items costs O(N^2) bytes over a run. Each result is appended as a
+        # JSON line instead, and the pickle is written once at the end (or
+        # on SIGINT) — the shard is the crash-recovery copy in between.
+        record_path = getattr(self.record, "file_path", None) or getattr(self.record, "new_path", "record.pickle")
+        self.shard_path = record_path.replace('.pickle', '') + '_udpipe_shard.jsonl'
+        self.shard_fh = open(self.shard_path, 'a', buffering=1)
+        # Failures follow the same append-only pattern: one JSON line per
+        # error instead of rewriting the whole blob on every SIGINT
+        self.failed_path = record_path.replace('.pickle', '') + '_failed_items.jsonl'
+        self.failed_fh = open(self.failed_path, 'a', buffering=1)
         records_all = len(self.record.response_data)
-        tabs = "\t" * 2
-        print(f"Total records to process:{tabs}{records_all}")
+        print(f"Total records to process:\t\t{records_all}")
         
-        try:
-            for i,row in enumerate(self.record.response_iter()): 
-                responseId = row["responseId"]
-                percentage = (i / records_all * 100) if records_all > 0 else 0
-                print(f"[{i:04d}/{records_all}] ({percentage:.1f}%) Processing row with responseId:{tabs}{responseId}")
-                
-                # Check if the responseId already has udpipe called 
-                if self.record.count_udpipe(responseId) > 0:
-                    print(f"Already generated udpipe for responseId \t\t{responseId}\n")
-                    continue
-
-                if("response" not in row):
-                    print(f"Response not found for responseId \t\t{responseId}\n")
-                    continue
-
-                message = row["response"]
-
-                if(message is None):
-                    print(f"Response is None for responseId \t\t{responseId}\n")
-                    continue
-                if(message == "" or message == " "):
-                    print(f"Response is empty for responseId \t\t{responseId}\n")
-                    continue
-                
-                # Process with error handling
-                try:
-                    # Call udpipe API
-                    response = self.generate_one_response(message)
+        # Filter the pending work up front, then overlap the network calls.
+        # The done-set is built once — count_udpipe per row rescans the
+        # udpipe data and turns resumed runs quadratic.
+        done = self.record.build_udpipe_done_set()
+        pending = []
+        skipped_done = 0
+        skipped_empty = 0
+        for i,row in enumerate(self.record.response_iter()): 
+            responseId = row["responseId"]
+            
+            # Check if the responseId already has udpipe called 
+            if responseId in done:
+                skipped_done += 1
+                continue
 
-                    # Call statistics
-                    stats = {}
-                    if generate_stats:
-                        stats = self.stats_generator.generate_statistics(response)
+            message = row.get("response")
 
-                    self.record.add_udpipe(responseId, response, stats)
-                    self.processed_count += 1
-                    
-                    # Save progress periodically
-                    if self.processed_count % self.save_interval == 0:
-                        self.record.save_to_mirror_file()
-                        print(f"Progress saved: {self.processed_count} items processed")
+            if not _valid_text(message):
+                skipped_empty += 1
+                continue
+            
+            pending.append((i, responseId, message))
+        
+        # One summary line instead of a print per skipped row — on resumed
+        # runs the skip printing alone used to dominate the warm-up
+        print(f"Pending rows after filtering:\t\t{len(pending)} "
+              f"(skipped {skipped_done} already done, {skipped_empty} empty)")
+        
+        try:
+            # The calls are pure network wait, so K workers overlap the
+            # round trips to the UDPipe server; short messages additionally
+            # share requests so the RTT amortizes over the whole batch
+            batches = self._make_batches(pending)
+            print(f"Submitting {len(batches)} requests for {len(pending)} rows")
+            # tqdm batches terminal updates; the per-row lines only format
+            # when someone actually enables DEBUG on the udpipe logger
+            pbar = tqdm(total=len(pending), desc="UDPipe")
+            # Stats run on their own small pool so the CoNLL-U walking
+            # overlaps the shard writes and the still-in-flight requests
+            stats_pool = ThreadPoolExecutor(max_workers=2)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                future_to_batch = {
+                    executor.submit(self.generate_batch_response, batch): batch
+                    for batch in batches
+                }
+                for future in as_completed(future_to_batch):
+                    batch = future_to_batch[future]
                     
-                    print(f"Done generating responses for responseId \t\t{responseId}\n")
+                    # Process with error handling
+                    try:
+                        responses = future.result()
+                    except Exception as e:
+                        for i, responseId, message in batch:
+                            error_info = {
+                                "responseId": responseId,
+                                "index": i,
+                                "error": str(e),
+                                "message_preview": message[:100] if message else "None"
+                            }
+                            self._record_failure(error_info)
+                            logger.error(f"Error processing responseId {responseId}: {e}")
+                        pbar.update(len(batch))
+                        pbar.set_postfix(failed=len(self.failed_items))
+                        continue
                     
-                except Exception as e:
-                    error_info = {
-                        "responseId": responseId,
-                        "index": i,
-                        "error": str(e),
-                        "message_preview": message[:100] if message else "None"
-                    }
-                    self.failed_items.append(error_info)
-                    print(f"Error processing responseId {responseId}: {e}")
-                    print(f"Adding to failed items list. Continuing with next item...\n")
+                    if generate_stats:
+                        stats_futures = [
+                            stats_pool.submit(self.stats_generator.generate_statistics, response)
+                            for response in responses
+                        ]
+                    else:
+                        stats_futures = [None] * len(responses)
                     
-                    # Save current state even on error
-                    try:
-                        self.record.save_to_mirror_file()
-                    except Exception as save_error:
-                        print(f"Warning: Failed to save after error: {save_error}")
+                    for (i, responseId, message), response, stats_future in zip(batch, responses, stats_futures):
+                        logger.debug(f"Finished responseId {responseId}")
+                        
+                        try:
+                            # Collect statistics (computed on the stats pool)
+                            stats = stats_future.result() if stats_future is not None else {}
+
+                            self.record.add_udpipe(responseId, response, stats)
+                            self.processed_count += 1
+                            
+                            # Persist incrementally to the shard (line-buffered)
+                            self.shard_fh.write(json.dumps({
+                                "responseId": str(responseId),
+                                "udpipe": response,
+                                "stats": stats,
+                            }, default=str) + '\n')
+                            
+                        except Exception as e:
+                            error_info = {
+                                "responseId": responseId,
+                                "index": i,
+                                "error": str(e),
+                                "message_preview": message[:100] if message else "None"
+                            }
+                            self._record_failure(error_info)
+                            logger.error(f"Error processing responseId {responseId}: {e}")
+                        
+                        pbar.update(1)
+                    pbar.set_postfix(failed=len(self.failed_items))
+            stats_pool.shutdown(wait=True)
+            pbar.close()
                     
         except KeyboardInterrupt:
             print("\nKeyboard interrupt detected. Saving current progress...")
@@ -143,6 +254,10 @@ class UdpipeCaller():
         finally:
             # Final save and cleanup
             try:
+                if getattr(self, 'shard_fh', None) is not None:
+                    self.shard_fh.close()
+                if getattr(self, 'failed_fh', None) is not None:
+                    self.failed_fh.close()
                 self.record.save_to_mirror_file()
                 self.save_failed_items()
                 
@@ -2,7 +2,11 @@
 Shared UDPipe utilities for processing text data.
 """
 
+import re
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+import random
 import time
 import sys
 import os
@@ -16,8 +20,37 @@ except ImportError:
     print("Warning: conllu not installed. Install with: pip install conllu")
     parse = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 URL = 'http://lindat.mff.cuni.cz/services/udpipe/api/process'
 
+# One pooled keep-alive session per thread: clients stay cheap to build
+# (worker code constructs them freely) while the sockets are reused and
+# never shared across threads
+_TLS = threading.local()
+
+def _session():
+    session = getattr(_TLS, "session", None)
+    if session is None:
+        session = requests.Session()
+        # Skip the per-request environment scan (proxies, netrc, CA
+        # overrides) — it is re-run on every post otherwise and nothing
+        # here depends on it
+        session.trust_env = False
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _TLS.session = session
+    return session
+
+# Paragraph sentinel used to pack several texts into one request; it
+# tokenizes as a single-word sentence, so the parsed output can be split
+# back into per-text segments
+BATCH_SENTINEL = "XUDPIPESEPX"
+
 class UDPipeClient:
     """Shared UDPipe client with retry logic and error handling."""
     
@@ -33,20 +66,30 @@ class UDPipeClient:
             'model': model,
         }
     
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with jitter: ~0.3s, 0.6s, 1.2s..., capped at
+        retry_delay. A transient 502 recovers in well under a second
+        instead of idling the fixed five seconds per attempt."""
+        return min(0.3 * (2 ** attempt), self.retry_delay) + random.random() * 0.1
+
     def generate_one_response(self, message):
         """Generate response with retry logic and error handling."""
         for attempt in range(self.max_retries):
             try:
                 request_param = self.data_metadata.copy()
                 request_param["data"] = message
-                response = requests.post(self.url, data=request_param, timeout=30)
+                response = _session().post(self.url, data=request_param, timeout=30)
                 
                 # Check if the response is valid
                 if response.status_code != 200:
                     raise Exception(f"HTTP Error: {response.status_code}, {response.text}")
                 
-                # Check if the response contains result
-                response_json = response.json()
+                # Check if the response contains result. orjson decodes the
+                # large CoNLL-U payload string ~2x faster than stdlib json
+                if orjson is not None:
+                    response_json = orjson.loads(response.content)
+                else:
+                    response_json = response.json()
                 if "result" not in response_json:
                     raise Exception(f"No result in response: {response_json}")
                 
@@ -56,7 +99,7 @@ class UDPipeClient:
             except requests.exceptions.Timeout:
                 print(f"Timeout on attempt {attempt + 1}/{self.max_retries}")
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
+                    time.sleep(self._backoff_delay(attempt))
                     continue
                 else:
                     raise Exception("Request timed out after all retries")
@@ -64,7 +107,7 @@ class UDPipeClient:
             except requests.exceptions.RequestException as e:
                 print(f"Request error on attempt {attempt + 1}/{self.max_retries}: {e}")
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
+                    time.sleep(self._backoff_delay(attempt))
                     continue
                 else:
                     raise Exception(f"Request failed after all retries: {e}")
@@ -72,13 +115,47 @@ class UDPipeClient:
             except Exception as e:
                 print(f"Error on attempt {attempt + 1}/{self.max_retries}: {e}")
                 if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
+                    time.sleep(self._backoff_delay(attempt))
                     continue
                 else:
                     raise e
         
         raise Exception("All retry attempts failed")
     
+    def generate_batch_response(self, messages):
+        """
+        Parse several texts with a single request.
+
+        The texts are joined with a sentinel paragraph and re-split after
+        parsing, so N network round trips collapse into one.
+
+        Args:
+            messages: List of texts to parse
+
+        Returns:
+            List with one list of parsed sentences per input message
+
+        Raises:
+            Exception: If the request fails or the split does not line up
+        """
+        separator = "\n\n" + BATCH_SENTINEL + "\n\n"
+        udpipe_output = self.generate_one_response(separator.join(messages))
+        sentences = self.parse_response(udpipe_output)
+
+        per_message = [[] for _ in messages]
+        slot = 0
+        for sentence in sentences:
+            if len(sentence) == 1 and sentence[0]["form"] == BATCH_SENTINEL:
+                slot += 1
+                continue
+            if slot < len(per_message):
+                per_message[slot].append(sentence)
+        if slot != len(messages) - 1:
+            raise Exception(
+                f"Batch split mismatch: {slot + 1} segments for {len(messages)} messages"
+            )
+        return per_message
+
     def parse_response(self, udpipe_output):
         """Parse UDPipe output into CoNLL-U format."""
         if parse is None:
@@ -86,6 +163,44 @@ class UDPipeClient:
         return parse(udpipe_output)
 
 
+# Dependency relations whose tokens are dropped from the lemma string
+_EXCLUDED_DEPRELS = frozenset(("punct", "nummod"))
+
+# Token line matcher: captures only LEMMA (field 3) and DEPREL (field 8),
+# so the field splitting runs inside the regex engine in C instead of
+# allocating all ten columns per token in Python
+_CONLLU_TOKEN = re.compile(
+    r"^[0-9][^\t\n]*\t"                              # ID (incl. ranges)
+    r"[^\t\n]*\t"                                    # FORM
+    r"([^\t\n]*)\t"                                  # LEMMA
+    r"[^\t\n]*\t[^\t\n]*\t[^\t\n]*\t[^\t\n]*\t"  # UPOS XPOS FEATS HEAD
+    r"([^\t\n]*)",                                    # DEPREL
+    re.M,
+)
+
+
+def extract_lemmas_from_conllu(udpipe_output):
+    """
+    Extract lemmas straight from raw CoNLL-U text.
+
+    conllu.parse builds a dict per token carrying all ten fields, but this
+    consumer only reads LEMMA and DEPREL — scanning the lines directly
+    skips every one of those allocations. Same filtering as
+    extract_lemmas_string (punct and nummod dropped).
+
+    Args:
+        udpipe_output: Raw CoNLL-U output from UDPipe
+
+    Returns:
+        str: Space-separated string of lemmas
+    """
+    return " ".join(
+        lemma
+        for lemma, deprel in _CONLLU_TOKEN.findall(udpipe_output)
+        if deprel not in _EXCLUDED_DEPRELS
+    )
+
+
 def extract_lemmas_string(sentences):
     """
     Extract lemmas from a list of sentences and return them as a single string.
@@ -97,12 +212,11 @@ def extract_lemmas_string(sentences):
     Returns:
         str: Space-separated string of lemmas (excluding punctuation and nummod)
     """
-    lemmas = []
-    for sentence in sentences:
-        for token in sentence:
-            if token["deprel"] == "punct":
-                continue
-            if token["deprel"] == "nummod":
-                continue
-            lemmas.append(token["lemma"])
-    return " ".join(lemmas)
+    # One hashed membership test per token, generator-fed join — no
+    # intermediate list and no chained equality checks
+    return " ".join(
+        token["lemma"]
+        for sentence in sentences
+        for token in sentence
+        if token["deprel"] not in _EXCLUDED_DEPRELS
+    )